@@ -86,6 +86,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'common.budget.QueryBudgetMiddleware',
 ]
 if DEBUG:
     MIDDLEWARE += ['debug_toolbar.middleware.DebugToolbarMiddleware',]
@@ -184,6 +185,10 @@ REST_FRAMEWORK = {
         'rest_framework.authentication.TokenAuthentication',
         'rest_framework.authentication.SessionAuthentication'
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'common.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
     'DEFAULT_THROTTLE_RATES': {
         'burst': '1/s',
         'rapid': '100/hour',
@@ -212,6 +217,19 @@ CURRENCY = 'usd'
 
 MAXIMUM_CART_ITEMS = 20
 
+# "database", or "redis" to keep a hot copy of the carts in redis, see cart.store
+CART_BACKEND = env("CART_BACKEND", default="database")
+CART_REDIS_URL = env("CART_REDIS_URL", default=CACHEOPS_REDIS)
+# seconds the write-behind waits for to batch the cart changes
+CART_FLUSH_DELAY = env.int("CART_FLUSH_DELAY", default=5)
+
+# share of the requests whose queries are counted against the view's query_budget
+QUERY_BUDGET_SAMPLE_RATE = env.float("QUERY_BUDGET_SAMPLE_RATE", default=0.01)
+
+# image renditions are rendered by a background process pool
+RENDITIONS_ASYNC = env.bool("RENDITIONS_ASYNC", default=True)
+RENDITION_WORKERS = env.int("RENDITION_WORKERS", default=2)
+
 if not DEBUG:
     STORAGES = {
         "default": {
@@ -259,6 +277,18 @@ LOGGING = {
             'class': 'logging.StreamHandler',
             'formatter': 'simple',
         },
+        'budget': {
+            'level': 'WARNING',
+            'class': 'logging.StreamHandler',
+            'formatter': 'simple',
+        },
+    },
+    'loggers': {
+        # query budget violations
+        'common.budget': {
+            'handlers': ['budget'],
+            'level': 'WARNING',
+        },
     },
     'formatters': {
         'simple': {
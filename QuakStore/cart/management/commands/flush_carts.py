@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from cart.store import cart_store
+
+
+class Command(BaseCommand):
+    help = "Write every changed hot cart to the database, a safety net for the background write-behind"
+
+    def handle(self, *args, **options):
+        store = cart_store()
+        if store is None:
+            raise CommandError("The carts only live in the database, set CART_BACKEND to redis")
+        count = store.flush_dirty()
+        self.stdout.write(self.style.SUCCESS(f"Flushed {count} carts"))
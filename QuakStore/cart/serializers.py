@@ -11,6 +11,7 @@ from rest_framework.exceptions import ValidationError
 
 from .models import CartItem
 from product.serializers import ProductSerializer, Product
+from common.serializers import SparseFieldsetMixin
 
 
 class ModelCountValidator:
@@ -23,7 +24,7 @@ class ModelCountValidator:
         if current_count >= self.max_count:
             raise ValidationError(_(f"Cannot have more than {self.max_count} instances of {self.queryset.model._meta.verbose_name}"))
 
-class CartItemSerializer(serializers.ModelSerializer):
+class CartItemSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     def __init__(self, instance=None, data=empty, detail = False, omit_pid=False, **kwargs):
         super().__init__(instance, data, **kwargs)
         
@@ -97,4 +98,31 @@ class CartBulkSerializer(serializers.Serializer):
     items = serializers.ListField(
         child= CartItemBulkSerializer(),
         allow_empty=False
-    )
\ No newline at end of file
+    )
+
+
+class CartItemAddSerializer(serializers.Serializer):
+    product = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=1, max_value=1000)
+
+
+class CartSyncSerializer(serializers.Serializer):
+    MODES = ('replace', 'merge')
+
+    items = serializers.ListField(child=CartItemAddSerializer(), allow_empty=True, max_length=100)
+    mode = serializers.ChoiceField(choices=MODES, default='replace')
+
+    def validate_items(self, value):
+        products = [item['product'] for item in value]
+        if len(products) != len(set(products)):
+            raise ValidationError(_("A product can only appear once"))
+        return value
+
+
+class HotCartItemSerializer(serializers.Serializer):
+    product = serializers.PrimaryKeyRelatedField(queryset=Product.objects.only('pk', 'stock'))
+    quantity = serializers.IntegerField(min_value=1, max_value=1000)
+
+
+class HotCartQuantitySerializer(serializers.Serializer):
+    quantity = serializers.IntegerField(min_value=1, max_value=1000)
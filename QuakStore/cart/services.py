@@ -0,0 +1,237 @@
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.db.models import F, Sum, Window, Case, When, Value, CharField
+
+from common.cache import invalidate_tags
+from product.models import Product
+
+from .models import CartItem
+
+
+# per line, see CartItem.quantity
+MAXIMUM_QUANTITY = 1000
+
+
+class CartLimitError(Exception):
+    OUT_OF_STOCK = -1
+    TOO_MANY_ITEMS = -2
+    TOO_MANY_UNITS = -3
+    UNKNOWN_PRODUCT = -5
+
+    def __init__(self, code: int, stock: int | None = None) -> None:
+        super().__init__(code)
+        self.code = code
+        self.stock = stock
+
+
+def cart_tag(user_id: int) -> str:
+    return f"cart:{user_id}"
+
+
+def invalidate_cart(user_id: int) -> None:
+    invalidate_tags(cart_tag(user_id))
+
+
+def cart_summary(user_id: int) -> dict:
+    """
+    The cart lines with their discounted totals and stock warnings, and the
+    cart totals, from a single query: the totals are window aggregates over
+    the lines.
+    """
+    rows = CartItem.objects\
+        .filter(user_id=user_id)\
+        .annotate(
+            line_total=F('quantity') * F('product__effective_price'),
+            list_total=F('quantity') * F('product__price'),
+            warning=Case(
+                When(product__stock=0, then=Value('out_of_stock')),
+                When(quantity__gt=F('product__stock'), then=Value('insufficient_stock')),
+                default=None,
+                output_field=CharField(),
+            ),
+            subtotal=Window(Sum(F('quantity') * F('product__effective_price'))),
+            list_subtotal=Window(Sum(F('quantity') * F('product__price'))),
+            unit_count=Window(Sum('quantity')),
+        )\
+        .values(
+            'id', 'product_id', 'product__name', 'product__slug', 'quantity', 'product__price',
+            'product__effective_price', 'product__stock', 'product__discount__name', 'product__discount__percent',
+            'product__discount__active', 'line_total', 'list_total', 'warning', 'subtotal', 'list_subtotal', 'unit_count',
+        )\
+        .order_by('date_added', 'id')
+    rows = list(rows)
+
+    lines = [
+        {
+            'id': row['id'],
+            'product': row['product_id'],
+            'name': row['product__name'],
+            'slug': row['product__slug'],
+            'quantity': row['quantity'],
+            'price': row['product__price'],
+            'effective_price': row['product__effective_price'],
+            'discount': {
+                'name': row['product__discount__name'],
+                'percent': row['product__discount__percent'],
+            } if row['product__discount__active'] else None,
+            'line_total': row['line_total'],
+            'stock': row['product__stock'],
+            'warning': row['warning'],
+        }
+        for row in rows
+    ]
+    totals = rows[0] if rows else {'subtotal': 0, 'list_subtotal': 0, 'unit_count': 0}
+    return {
+        'lines': lines,
+        'item_count': len(lines),
+        'unit_count': totals['unit_count'],
+        'list_subtotal': totals['list_subtotal'],
+        'discount_total': totals['list_subtotal'] - totals['subtotal'],
+        'subtotal': totals['subtotal'],
+        'has_warnings': any(line['warning'] for line in lines),
+    }
+
+
+ADD_TO_CART_SQL = """
+WITH product AS (
+    SELECT {product_id} AS id, {stock} AS stock FROM {product_table} WHERE {product_id} = %(product)s
+), line AS (
+    SELECT {quantity} AS quantity FROM {cart_table} WHERE {user_id} = %(user)s AND {item_product_id} = %(product)s
+), cart AS (
+    SELECT COUNT(*) AS items FROM {cart_table} WHERE {user_id} = %(user)s
+)
+INSERT INTO {cart_table} ({user_id}, {item_product_id}, {quantity}, {date_added}, {date_modified})
+SELECT %(user)s, product.id, %(quantity)s, NOW(), NOW()
+FROM product, cart
+WHERE %(quantity)s + COALESCE((SELECT quantity FROM line), 0) <= LEAST(product.stock, %(max_quantity)s)
+    AND (EXISTS (SELECT 1 FROM line) OR cart.items < %(max_items)s)
+ON CONFLICT ({user_id}, {item_product_id}) DO UPDATE
+SET {quantity} = {cart_table}.{quantity} + EXCLUDED.{quantity}, {date_modified} = EXCLUDED.{date_modified}
+WHERE {cart_table}.{quantity} + EXCLUDED.{quantity} <= LEAST((SELECT stock FROM product), %(max_quantity)s)
+RETURNING {id}, {quantity}, (xmax = 0) AS created
+"""
+
+
+def _add_to_cart_sql() -> str:
+    qn = connection.ops.quote_name
+    item = CartItem._meta
+    return ADD_TO_CART_SQL.format(
+        product_table=qn(Product._meta.db_table),
+        product_id=qn(Product._meta.pk.column),
+        stock=qn(Product._meta.get_field('stock').column),
+        cart_table=qn(item.db_table),
+        id=qn(item.pk.column),
+        user_id=qn(item.get_field('user').column),
+        item_product_id=qn(item.get_field('product').column),
+        quantity=qn(item.get_field('quantity').column),
+        date_added=qn(item.get_field('date_added').column),
+        date_modified=qn(item.get_field('date_modified').column),
+    )
+
+
+def add_to_cart(user_id: int, product_id: int, quantity: int) -> tuple[dict, bool]:
+    """
+    Add `quantity` units of a product to the cart in one INSERT ... ON
+    CONFLICT DO UPDATE statement, which also checks the stock, the cart
+    size and the line quantity, so concurrent adds of the same product
+    merge. Returns the cart line and whether it was created, raises
+    `CartLimitError` when a check fails.
+    """
+    params = {
+        'user': user_id,
+        'product': product_id,
+        'quantity': quantity,
+        'max_quantity': MAXIMUM_QUANTITY,
+        'max_items': settings.MAXIMUM_CART_ITEMS,
+    }
+    with connection.cursor() as cursor:
+        cursor.execute(_add_to_cart_sql(), params)
+        row = cursor.fetchone()
+
+    if row is None:
+        # rejected, find out why
+        stock = Product.objects.filter(pk=product_id).values_list('stock', flat=True).first()
+        if stock is None:
+            raise CartLimitError(CartLimitError.UNKNOWN_PRODUCT)
+        current = CartItem.objects.filter(user_id=user_id, product_id=product_id).values_list('quantity', flat=True).first()
+        if current is None and stock >= quantity:
+            raise CartLimitError(CartLimitError.TOO_MANY_ITEMS, stock)
+        if (current or 0) + quantity > MAXIMUM_QUANTITY:
+            raise CartLimitError(CartLimitError.TOO_MANY_UNITS, stock)
+        raise CartLimitError(CartLimitError.OUT_OF_STOCK, stock)
+
+    pk, line_quantity, created = row
+    invalidate_cart(user_id)
+    return {'id': pk, 'product': product_id, 'user': user_id, 'quantity': line_quantity}, created
+
+
+def sync_cart(user_id: int, desired: dict[int, int], replace: bool = True) -> list[dict]:
+    """
+    Bring the cart to the `desired` product -> quantity state in a single
+    transaction, leaving the other lines alone unless `replace`. The stock
+    of every product is read in one query, lines that can't be applied are
+    rejected one by one instead of failing the whole sync. Returns the
+    outcome of every line, in the desired order then the deleted ones.
+    """
+    with transaction.atomic():
+        existing = {
+            item.product_id: item
+            for item in CartItem.objects.select_for_update().filter(user_id=user_id)
+        }
+        stocks = dict(Product.objects.filter(pk__in=desired).values_list('pk', 'stock'))
+
+        results = []
+        created: list[CartItem] = []
+        updated: list[CartItem] = []
+        now = timezone.now()
+        kept = set(existing) - set(desired) if not replace else set()
+        line_count = len(kept)
+
+        for product_id, quantity in desired.items():
+            result = {'product': product_id, 'quantity': quantity}
+            results.append(result)
+            item = existing.get(product_id)
+            stock = stocks.get(product_id)
+
+            if stock is None:
+                result.update(status='rejected', reason='unknown_product')
+            elif quantity > stock:
+                result.update(status='rejected', reason='out_of_stock', available=stock)
+            elif item is None and line_count >= settings.MAXIMUM_CART_ITEMS:
+                result.update(status='rejected', reason='too_many_items')
+            elif item is None:
+                created.append(CartItem(user_id=user_id, product_id=product_id, quantity=quantity))
+                result['status'] = 'created'
+            elif item.quantity != quantity:
+                item.quantity = quantity
+                item.date_modified = now
+                updated.append(item)
+                result['status'] = 'updated'
+            else:
+                result['status'] = 'unchanged'
+
+            if result['status'] != 'rejected' or item is not None:
+                # a rejected line already in the cart stays as it was
+                line_count += 1
+
+        deleted = [product_id for product_id in existing if product_id not in desired] if replace else []
+
+        if created:
+            # only the existing lines are locked, an add_to_cart racing the
+            # sync may have inserted one of these in the meantime
+            CartItem.objects.bulk_create(
+                created,
+                update_conflicts=True,
+                unique_fields=['user', 'product'],
+                update_fields=['quantity', 'date_modified'],
+            )
+        if updated:
+            CartItem.objects.bulk_update(updated, ['quantity', 'date_modified'])
+        if deleted:
+            CartItem.objects.filter(user_id=user_id, product_id__in=deleted).delete()
+        results += [{'product': product_id, 'quantity': 0, 'status': 'deleted'} for product_id in deleted]
+
+        if created or updated or deleted:
+            invalidate_cart(user_id)
+    return results
@@ -0,0 +1,11 @@
+from django.dispatch import receiver
+from django.db.models.signals import post_save, post_delete
+
+from .models import CartItem
+from .services import invalidate_cart
+
+
+@receiver(post_save, sender=CartItem)
+@receiver(post_delete, sender=CartItem)
+def invalidate_cart_cache(sender, instance: CartItem, *args, **kwargs):
+    invalidate_cart(instance.user_id)
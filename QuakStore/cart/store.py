@@ -0,0 +1,235 @@
+"""
+Hot cart storage. With `CART_BACKEND = "redis"` every cart is a redis hash
+of product id to quantity, read and written without touching the database.
+Changes are written behind to `CartItem` by a background flush, and
+synchronously before checkout.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import redis
+
+from django.conf import settings
+from django.db import transaction, close_old_connections
+
+from product.models import Product
+
+from .models import CartItem
+from .services import invalidate_cart, CartLimitError, MAXIMUM_QUANTITY
+
+
+logger = logging.getLogger(__name__)
+
+# marks a hash loaded from the database, so an empty cart isn't loaded again
+LOADED_FIELD = '_'
+DIRTY_KEY = 'cart:dirty'
+FLUSH_PENDING_KEY = 'cart:flush-pending'
+CART_TTL = 60 * 60 * 24 * 7
+# flush_and_discard tries again when the cart is written meanwhile
+FLUSH_ATTEMPTS = 5
+
+# KEYS: cart hash, dirty set
+# ARGV: product id, quantity, stock, max items, ttl, user id, "add" or "set"
+WRITE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return -4 end
+local current = tonumber(redis.call('HGET', KEYS[1], ARGV[1]) or '0')
+local quantity = tonumber(ARGV[2])
+if ARGV[7] == 'add' then quantity = current + quantity end
+if quantity > tonumber(ARGV[3]) then return -1 end
+if current == 0 and redis.call('HLEN', KEYS[1]) - 1 >= tonumber(ARGV[4]) then return -2 end
+if quantity > %d then return -3 end
+redis.call('HSET', KEYS[1], ARGV[1], quantity)
+redis.call('EXPIRE', KEYS[1], ARGV[5])
+redis.call('SADD', KEYS[2], ARGV[6])
+return quantity
+""" % MAXIMUM_QUANTITY
+
+
+class RedisCartStore:
+    def __init__(self, url: str) -> None:
+        self.client = redis.Redis.from_url(url)
+        self.write_script = self.client.register_script(WRITE_SCRIPT)
+        self._pool: ThreadPoolExecutor | None = None
+        self._pool_lock = threading.Lock()
+
+    def key(self, user_id: int) -> str:
+        return f"cart:{user_id}"
+
+    def load(self, user_id: int) -> None:
+        """Copy the stored cart in redis, unless it's there already."""
+        key = self.key(user_id)
+        if self.client.exists(key):
+            return
+        quantities = dict(CartItem.objects.filter(user_id=user_id).values_list('product_id', 'quantity'))
+        pipe = self.client.pipeline()
+        pipe.hsetnx(key, LOADED_FIELD, 1)
+        for product_id, quantity in quantities.items():
+            pipe.hsetnx(key, product_id, quantity)
+        pipe.expire(key, CART_TTL)
+        pipe.execute()
+
+    def items(self, user_id: int) -> dict[int, int]:
+        self.load(user_id)
+        return {
+            int(product_id): int(quantity)
+            for product_id, quantity in self.client.hgetall(self.key(user_id)).items()
+            if product_id != LOADED_FIELD.encode()
+        }
+
+    def _write(self, user_id: int, product_id: int, quantity: int, stock: int, mode: str) -> int:
+        args = [product_id, quantity, stock, settings.MAXIMUM_CART_ITEMS, CART_TTL, user_id, mode]
+        keys = [self.key(user_id), DIRTY_KEY]
+        result = self.write_script(keys=keys, args=args)
+        if result == -4:
+            self.load(user_id)
+            result = self.write_script(keys=keys, args=args)
+        if result < 0:
+            raise CartLimitError(result, stock)
+        self.schedule_flush()
+        return result
+
+    def add(self, user_id: int, product_id: int, quantity: int, stock: int) -> int:
+        """
+        Atomically add `quantity` units of a product, checking the stock and
+        the cart limits. Returns the new quantity.
+        """
+        return self._write(user_id, product_id, quantity, stock, 'add')
+
+    def set(self, user_id: int, product_id: int, quantity: int, stock: int) -> int:
+        return self._write(user_id, product_id, quantity, stock, 'set')
+
+    def remove(self, user_id: int, product_id: int) -> bool:
+        self.load(user_id)
+        pipe = self.client.pipeline()
+        pipe.hdel(self.key(user_id), product_id)
+        pipe.sadd(DIRTY_KEY, user_id)
+        removed, _ = pipe.execute()
+        self.schedule_flush()
+        return bool(removed)
+
+    def discard(self, user_id: int) -> None:
+        """Forget the hot copy, the next read loads the stored cart again."""
+        pipe = self.client.pipeline()
+        pipe.delete(self.key(user_id))
+        pipe.srem(DIRTY_KEY, user_id)
+        pipe.execute()
+
+    def drop_lines(self, user_id: int, product_ids: list[int]) -> None:
+        """
+        Drop checked out lines from a hot copy loaded meanwhile, and write
+        whatever else was put in it behind.
+        """
+        key = self.key(user_id)
+        if not product_ids or not self.client.exists(key):
+            return
+        pipe = self.client.pipeline()
+        pipe.hdel(key, *product_ids)
+        pipe.sadd(DIRTY_KEY, user_id)
+        pipe.execute()
+        self.flush(user_id)
+
+    def flush(self, user_id: int) -> None:
+        """Write the hot copy of a cart to `CartItem`, when it changed."""
+        if not self.client.srem(DIRTY_KEY, user_id):
+            return
+        try:
+            gone = self._persist(user_id, self.client.hgetall(self.key(user_id)))
+            if gone:
+                self.client.hdel(self.key(user_id), *gone)
+        except Exception:
+            self.client.sadd(DIRTY_KEY, user_id)
+            raise
+
+    def flush_and_discard(self, user_id: int) -> None:
+        """
+        Write the hot copy of a cart to `CartItem` and forget it in one step.
+        The hot copy is watched: a write landing in between fails the
+        discard and the flush starts over, instead of being lost with it.
+        """
+        key = self.key(user_id)
+        for attempt in range(FLUSH_ATTEMPTS):
+            with self.client.pipeline() as pipe:
+                try:
+                    pipe.watch(key)
+                    raw = pipe.hgetall(key)
+                    if pipe.sismember(DIRTY_KEY, user_id):
+                        self._persist(user_id, raw)
+                    pipe.multi()
+                    pipe.delete(key)
+                    pipe.srem(DIRTY_KEY, user_id)
+                    pipe.execute()
+                    return
+                except redis.WatchError:
+                    if attempt == FLUSH_ATTEMPTS - 1:
+                        raise
+
+    def _persist(self, user_id: int, raw: dict[bytes, bytes]) -> set[int]:
+        """
+        Replace the stored cart with the hot copy `raw`, returns the
+        products it holds that were deleted meanwhile.
+        """
+        if LOADED_FIELD.encode() not in raw:
+            # evicted, the stored cart is all there is
+            return set()
+        quantities = {
+            int(product_id): int(quantity)
+            for product_id, quantity in raw.items()
+            if product_id != LOADED_FIELD.encode()
+        }
+        existing = set(Product.objects.filter(pk__in=quantities).values_list('pk', flat=True))
+
+        with transaction.atomic():
+            CartItem.objects.filter(user_id=user_id).exclude(product_id__in=existing).delete()
+            CartItem.objects.bulk_create(
+                [
+                    CartItem(user_id=user_id, product_id=product_id, quantity=quantities[product_id])
+                    for product_id in existing
+                ],
+                update_conflicts=True,
+                unique_fields=['user', 'product'],
+                update_fields=['quantity', 'date_modified'],
+            )
+            invalidate_cart(user_id)
+        return set(quantities) - existing
+
+    def flush_dirty(self) -> int:
+        """Flush every changed cart, returns how many were."""
+        count = 0
+        for user_id in self.client.smembers(DIRTY_KEY):
+            self.flush(int(user_id))
+            count += 1
+        return count
+
+    def schedule_flush(self) -> None:
+        # at most one pending flush across the processes, it picks up every change made until it runs
+        delay = settings.CART_FLUSH_DELAY
+        if not self.client.set(FLUSH_PENDING_KEY, 1, nx=True, ex=max(delay, 1)):
+            return
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='cart-flush')
+        self._pool.submit(self._delayed_flush, delay)
+
+    def _delayed_flush(self, delay: int) -> None:
+        time.sleep(delay)
+        try:
+            self.flush_dirty()
+        except Exception:
+            logger.exception("Cart write-behind failed")
+        finally:
+            close_old_connections()
+
+
+_store: RedisCartStore | None = None
+
+
+def cart_store() -> RedisCartStore | None:
+    """The hot cart store, `None` when the carts only live in the database."""
+    global _store
+    if settings.CART_BACKEND != 'redis':
+        return None
+    if _store is None:
+        _store = RedisCartStore(settings.CART_REDIS_URL)
+    return _store
@@ -0,0 +1,172 @@
+import fakeredis
+import pytest
+
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from . import store as cart_stores
+from .models import CartItem
+from .services import CartLimitError, MAXIMUM_QUANTITY
+from .store import RedisCartStore, DIRTY_KEY
+
+
+@pytest.fixture
+def store(monkeypatch):
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(cart_stores.redis.Redis, 'from_url', lambda url: fakeredis.FakeRedis(server=server))
+    store = RedisCartStore('redis://cart')
+    # flushed by the tests themselves, not by a background thread
+    monkeypatch.setattr(store, 'schedule_flush', lambda: None)
+    return store
+
+
+def stored_cart(user) -> dict[int, int]:
+    return dict(CartItem.objects.filter(user=user).values_list('product_id', 'quantity'))
+
+
+@pytest.mark.django_db
+class TestRedisCartStore:
+    def test_adds_accumulate_up_to_the_stock(self, store, user, products):
+        product = products[0]
+        assert store.add(user.pk, product.pk, 2, product.stock) == 2
+        assert store.add(user.pk, product.pk, 3, product.stock) == 5
+
+        with pytest.raises(CartLimitError) as e:
+            store.add(user.pk, product.pk, 1, product.stock)
+        assert e.value.code == CartLimitError.OUT_OF_STOCK
+        assert store.items(user.pk) == {product.pk: 5}
+
+    def test_set_replaces_the_quantity(self, store, user, products):
+        product = products[0]
+        store.add(user.pk, product.pk, 4, product.stock)
+        assert store.set(user.pk, product.pk, 1, product.stock) == 1
+        assert store.items(user.pk) == {product.pk: 1}
+
+    @override_settings(MAXIMUM_CART_ITEMS=1)
+    def test_cart_size_is_checked(self, store, user, products):
+        first, second, _ = products
+        store.set(user.pk, first.pk, 1, first.stock)
+        # changing a line already in the cart is fine
+        store.set(user.pk, first.pk, 2, first.stock)
+
+        with pytest.raises(CartLimitError) as e:
+            store.set(user.pk, second.pk, 1, second.stock)
+        assert e.value.code == CartLimitError.TOO_MANY_ITEMS
+
+    def test_quantity_is_capped(self, store, user, products):
+        with pytest.raises(CartLimitError) as e:
+            store.set(user.pk, products[0].pk, MAXIMUM_QUANTITY + 1, MAXIMUM_QUANTITY * 2)
+        assert e.value.code == CartLimitError.TOO_MANY_UNITS
+
+    def test_first_read_loads_the_stored_cart(self, store, user, products):
+        CartItem.objects.create(user=user, product=products[0], quantity=2)
+        assert store.items(user.pk) == {products[0].pk: 2}
+
+    def test_flush_writes_the_changes_behind(self, store, user, products):
+        first, second, third = products
+        CartItem.objects.create(user=user, product=first, quantity=1)
+        store.set(user.pk, second.pk, 2, second.stock)
+        store.set(user.pk, third.pk, 3, third.stock)
+        store.remove(user.pk, first.pk)
+        assert stored_cart(user) == {first.pk: 1}
+
+        store.flush(user.pk)
+
+        assert stored_cart(user) == {second.pk: 2, third.pk: 3}
+        assert not store.client.sismember(DIRTY_KEY, user.pk)
+
+    def test_flush_drops_deleted_products(self, store, user, products):
+        first, second, _ = products
+        store.set(user.pk, first.pk, 1, first.stock)
+        store.set(user.pk, second.pk, 1, second.stock)
+        second.delete()
+
+        store.flush(user.pk)
+
+        assert stored_cart(user) == {first.pk: 1}
+        assert store.items(user.pk) == {first.pk: 1}
+
+    def test_unchanged_cart_is_not_flushed(self, store, user, products):
+        store.items(user.pk)
+        CartItem.objects.create(user=user, product=products[0], quantity=2)
+
+        store.flush(user.pk)
+
+        assert stored_cart(user) == {products[0].pk: 2}
+
+    def test_discard_forgets_the_hot_copy(self, store, user, products):
+        first, second, _ = products
+        CartItem.objects.create(user=user, product=first, quantity=1)
+        store.set(user.pk, second.pk, 2, second.stock)
+
+        store.discard(user.pk)
+
+        assert stored_cart(user) == {first.pk: 1}
+        assert store.items(user.pk) == {first.pk: 1}
+        assert not store.client.sismember(DIRTY_KEY, user.pk)
+
+    def test_evicted_cart_is_loaded_again(self, store, user, products):
+        first, second, _ = products
+        CartItem.objects.create(user=user, product=first, quantity=1)
+        store.set(user.pk, second.pk, 2, second.stock)
+        store.client.delete(store.key(user.pk))
+
+        # evicted before its flush, the stored cart is all there is
+        store.flush(user.pk)
+        assert stored_cart(user) == {first.pk: 1}
+
+        # and the next write starts from it
+        assert store.add(user.pk, second.pk, 1, second.stock) == 1
+        assert store.items(user.pk) == {first.pk: 1, second.pk: 1}
+
+    def test_flush_and_discard_keeps_a_write_landing_in_between(self, store, user, products, monkeypatch):
+        first, second, _ = products
+        store.set(user.pk, first.pk, 1, first.stock)
+        persist = store._persist
+        writes = [lambda: store.set(user.pk, second.pk, 2, second.stock)]
+
+        def racing_persist(user_id, raw):
+            result = persist(user_id, raw)
+            while writes:
+                writes.pop()()
+            return result
+
+        monkeypatch.setattr(store, '_persist', racing_persist)
+        store.flush_and_discard(user.pk)
+
+        assert stored_cart(user) == {first.pk: 1, second.pk: 2}
+        assert not store.client.exists(store.key(user.pk))
+        assert not store.client.sismember(DIRTY_KEY, user.pk)
+
+    def test_drop_lines_keeps_a_write_made_while_checking_out(self, store, user, products):
+        first, second, _ = products
+        CartItem.objects.create(user=user, product=first, quantity=1)
+        # loaded again by a write while checking out, then the stored cart is cleared
+        store.set(user.pk, second.pk, 2, second.stock)
+        CartItem.objects.filter(user=user).delete()
+
+        store.drop_lines(user.pk, [first.pk])
+
+        assert stored_cart(user) == {second.pk: 2}
+        assert store.items(user.pk) == {second.pk: 2}
+
+    def test_drop_lines_without_a_hot_copy(self, store, user, products):
+        store.drop_lines(user.pk, [products[0].pk])
+        assert not store.client.exists(store.key(user.pk))
+
+
+@pytest.mark.django_db
+@override_settings(CART_BACKEND='redis')
+def test_stored_cart_writes_start_from_the_hot_copy(store, user, products, monkeypatch):
+    first, second, _ = products
+    monkeypatch.setattr(cart_stores, '_store', store)
+    store.set(user.pk, first.pk, 3, first.stock)
+
+    client = APIClient()
+    client.force_authenticate(user)
+    response = client.post(reverse('cartitems-list'), {'product': second.pk, 'quantity': 1})
+
+    assert response.status_code == 201, response.data
+    assert stored_cart(user) == {first.pk: 3, second.pk: 1}
+    assert not store.client.exists(store.key(user.pk))
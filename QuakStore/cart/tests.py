@@ -1,3 +1,104 @@
-from django.test import TestCase
+import pytest
 
-# Create your tests here.
+from django.test import override_settings
+
+from product.models import Product, Discount
+
+from .models import CartItem
+from .services import cart_summary, add_to_cart, sync_cart, CartLimitError
+
+
+@pytest.mark.django_db
+class TestCartSummary:
+    def test_empty_cart(self, user):
+        summary = cart_summary(user.pk)
+        assert summary['lines'] == []
+        assert summary['subtotal'] == 0
+        assert summary['item_count'] == 0
+    
+    def test_totals_and_warnings(self, user, category):
+        discount = Discount.objects.create(name='sale', percent=10)
+        first = Product.objects.create(category=category, name='first', slug='first', price=1000, stock=5, discount=discount)
+        second = Product.objects.create(category=category, name='second', slug='second', price=500, stock=1)
+        CartItem.objects.create(user=user, product=first, quantity=2)
+        CartItem.objects.create(user=user, product=second, quantity=3)
+        
+        summary = cart_summary(user.pk)
+        
+        assert [line['line_total'] for line in summary['lines']] == [1800, 1500]
+        assert [line['warning'] for line in summary['lines']] == [None, 'insufficient_stock']
+        assert summary['item_count'] == 2
+        assert summary['unit_count'] == 5
+        assert summary['list_subtotal'] == 3500
+        assert summary['discount_total'] == 200
+        assert summary['subtotal'] == 3300
+        assert summary['has_warnings']
+
+
+@pytest.mark.django_db
+class TestAddToCart:
+    def test_adds_merge_into_one_line(self, user, product):
+        item, created = add_to_cart(user.pk, product.pk, 2)
+        assert created
+        
+        item, created = add_to_cart(user.pk, product.pk, 3)
+        assert not created
+        assert item['quantity'] == 5
+        assert CartItem.objects.get(user=user, product=product).quantity == 5
+    
+    def test_stock_is_checked(self, user, product):
+        add_to_cart(user.pk, product.pk, 4)
+        with pytest.raises(CartLimitError) as e:
+            add_to_cart(user.pk, product.pk, 2)
+        assert e.value.code == CartLimitError.OUT_OF_STOCK
+        assert CartItem.objects.get(user=user, product=product).quantity == 4
+    
+    @override_settings(MAXIMUM_CART_ITEMS=1)
+    def test_cart_size_is_checked(self, user, product):
+        other = Product.objects.create(category=product.category, name='other', slug='other', price=1200, stock=5)
+        add_to_cart(user.pk, product.pk, 1)
+        with pytest.raises(CartLimitError) as e:
+            add_to_cart(user.pk, other.pk, 1)
+        assert e.value.code == CartLimitError.TOO_MANY_ITEMS
+    
+    def test_unknown_product(self, user):
+        with pytest.raises(CartLimitError) as e:
+            add_to_cart(user.pk, 404, 1)
+        assert e.value.code == CartLimitError.UNKNOWN_PRODUCT
+
+
+@pytest.mark.django_db
+class TestSyncCart:
+    def test_replace(self, user, products):
+        first, second, third = products
+        CartItem.objects.create(user=user, product=first, quantity=1)
+        CartItem.objects.create(user=user, product=second, quantity=2)
+        
+        results = sync_cart(user.pk, {second.pk: 3, third.pk: 9, 404: 1})
+        
+        assert [(result['product'], result['status']) for result in results] == [
+            (second.pk, 'updated'), (third.pk, 'rejected'), (404, 'rejected'), (first.pk, 'deleted')
+        ]
+        assert results[1]['available'] == 5
+        assert dict(CartItem.objects.filter(user=user).values_list('product_id', 'quantity')) == {second.pk: 3}
+    
+    def test_merge_keeps_other_lines(self, user, products):
+        first, second, _ = products
+        CartItem.objects.create(user=user, product=first, quantity=1)
+        
+        results = sync_cart(user.pk, {second.pk: 2}, replace=False)
+        
+        assert [result['status'] for result in results] == ['created']
+        assert dict(CartItem.objects.filter(user=user).values_list('product_id', 'quantity')) == {first.pk: 1, second.pk: 2}
+
+    def test_line_added_during_the_sync_is_overwritten(self, user, products, monkeypatch):
+        first, _, _ = products
+        # an add_to_cart inserting the line right after the sync locked the cart
+        CartItem.objects.create(user=user, product=first, quantity=1)
+        locked = CartItem.objects.select_for_update
+        monkeypatch.setattr(CartItem.objects, 'select_for_update', lambda: locked().exclude(product=first))
+
+        results = sync_cart(user.pk, {first.pk: 4}, replace=False)
+
+        assert [result['status'] for result in results] == ['created']
+        assert dict(CartItem.objects.filter(user=user).values_list('product_id', 'quantity')) == {first.pk: 4}
@@ -1,10 +1,13 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import CartItemViewSet
+from .views import CartItemViewSet, HotCartViewSet
 
 router = DefaultRouter()
 
 router.register('items', CartItemViewSet, basename='cartitems')
+if settings.CART_BACKEND == 'redis':
+    router.register('products', HotCartViewSet, basename='cartproducts')
 
 urlpatterns = [
     path('cart/', include(router.urls))
@@ -2,21 +2,44 @@ from django.db import transaction
 
 from rest_framework import viewsets
 from rest_framework.permissions import IsAuthenticated
-from .serializers import CartItemSerializer, CartItem, Product, CartItemUpdateSerializer, CartItemCreateSerializer, CartItemBulkSerializer, CartBulkSerializer
+from .serializers import CartItemSerializer, CartItem, Product, CartItemUpdateSerializer, CartItemBulkSerializer, CartBulkSerializer
+from .serializers import HotCartItemSerializer, HotCartQuantitySerializer, CartItemAddSerializer, CartSyncSerializer
+from .store import cart_store
+from .services import cart_summary, cart_tag, invalidate_cart, add_to_cart, sync_cart, CartLimitError
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.serializers import ValidationError
-from rest_framework.exceptions import MethodNotAllowed
+from rest_framework.exceptions import MethodNotAllowed, NotFound
+from rest_framework.permissions import SAFE_METHODS
 from rest_framework.decorators import action
 from rest_framework.request import Request
 
+from django.db.models import Prefetch
+
 from django.utils.translation import gettext_lazy as _
+from django.conf import settings
+from django.shortcuts import get_object_or_404
 
 from drf_yasg.utils import swagger_auto_schema
 
+from common.serializers import sparse_fieldset, field_requested
+from common.cache import get_or_build
+from common.conditional import conditional_response
+
 # Create your views here.
 
+def cart_limit_error(error: CartLimitError, product_id: int) -> ValidationError:
+    """The validation error a rejected cart write answers with."""
+    if error.code == CartLimitError.UNKNOWN_PRODUCT:
+        return ValidationError({'product': [_(f"Invalid pk \"{product_id}\" - object does not exist.")]})
+    if error.code == CartLimitError.OUT_OF_STOCK:
+        return ValidationError({'product': [_("Quantity higher than available stock") if error.stock else _("out of stock")]})
+    if error.code == CartLimitError.TOO_MANY_ITEMS:
+        return ValidationError(_(f"Cannot have more than {settings.MAXIMUM_CART_ITEMS} instances of {CartItem._meta.verbose_name}"))
+    return ValidationError({'quantity': [_("Quantity higher than allowed")]})
+
+
 class CartPagination(LimitOffsetPagination):
     max_limit = 10
 
@@ -26,10 +49,28 @@ class CartItemViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     pagination_class = CartPagination
 
+    cache_timeout = 60 * 15
+    query_budget = {'list': 8, 'retrieve': 6, 'summary': 4, 'create': 5, 'sync': 10}
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        store = cart_store()
+        if store is not None:
+            # the hot copy is written behind, bring the stored cart up to date first
+            if request.method in SAFE_METHODS:
+                store.flush(request.user.pk)
+            else:
+                store.flush_and_discard(request.user.pk)
+
     def get_queryset(self):
-        if self.action == 'retrieve':
-            return CartItem.objects.filter(user=self.request.user).select_related('product')
-        return CartItem.objects.filter(user= self.request.user)
+        queryset = CartItem.objects.filter(user=self.request.user)
+        if self.action in ('retrieve', 'list'):
+            if field_requested(self.request, 'product'):
+                queryset = queryset.prefetch_related(Prefetch(
+                    'product',
+                    Product.objects.for_fields(*sparse_fieldset(self.request, 'product'))
+                ))
+        return queryset
     
     def get_serializer(self, *args, **kwargs):
         detail = True
@@ -45,18 +86,26 @@ class CartItemViewSet(viewsets.ModelViewSet):
         return super().get_serializer_class()
 
     @swagger_auto_schema(
-        request_body=CartItemCreateSerializer
+        request_body=CartItemAddSerializer,
+        responses={
+            '200': 'added to the existing line',
+            '201': 'line created',
+            '400': 'invalid input or cart limits exceeded',
+        }
     )
     def create(self, request, *args, **kwargs):
-        user = request.user
-        data = request.data
-        serializer_data = data.copy()
-        serializer_data['user'] = request.user.pk
-        serializer = self.get_serializer(data=serializer_data, context = {'request': request})
+        """
+        Add units of a product, to its line when the product is in the cart
+        already.
+        """
+        serializer = CartItemAddSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        self.perform_create(serializer)
-        headers = self.get_success_headers(serializer.data)
-        return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
+        product_id = serializer.validated_data['product']
+        try:
+            item, created = add_to_cart(request.user.pk, product_id, serializer.validated_data['quantity'])
+        except CartLimitError as e:
+            raise cart_limit_error(e, product_id)
+        return Response(item, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
     
     def update(self, request, *args, **kwargs):
         if not kwargs.get('partial', False):
@@ -93,8 +142,95 @@ class CartItemViewSet(viewsets.ModelViewSet):
             item.quantity = quantity
         
         CartItem.objects.bulk_update(items, ['quantity'])
+        invalidate_cart(request.user.pk)
         
         return Response(status=status.HTTP_200_OK)
+
+    @swagger_auto_schema(
+        request_body=CartSyncSerializer,
+        method='put',
+        responses={
+            '200': 'the outcome of every line',
+            '400': 'invalid input',
+        }
+    )
+    @action(methods=['put'], detail=False)
+    def sync(self, request: Request):
+        """
+        Make the cart match the given product and quantity pairs, `replace`
+        deletes the other lines while `merge` keeps them. Lines that can't
+        be applied are reported and the others still are.
+        """
+        serializer = CartSyncSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        desired = {item['product']: item['quantity'] for item in serializer.validated_data['items']}
+        results = sync_cart(request.user.pk, desired, replace=serializer.validated_data['mode'] == 'replace')
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+    @action(methods=['get'], detail=False, pagination_class=None)
+    def summary(self, request: Request):
+        """
+        Every line of the cart with its discounted total and stock warning,
+        and the cart totals, cached until the cart or one of its products
+        changes.
+        """
+        def build():
+            summary = cart_summary(request.user.pk)
+            tags = {cart_tag(request.user.pk)} | {f"product:{line['product']}" for line in summary['lines']}
+            return summary, tags
+
+        data, etag = get_or_build(request, build, self.cache_timeout, prefix=f"cart:{request.user.pk}")
+        return conditional_response(request, lambda: Response(data), etag=etag)
             
         
         
+
+
+class HotCartViewSet(viewsets.ViewSet):
+    """
+    The cart as product and quantity pairs, read and written in the hot cart
+    store only. Routed with `CART_BACKEND = "redis"`.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def write(self, write, product: Product, quantity: int) -> Response:
+        try:
+            quantity = write(self.request.user.pk, product.pk, quantity, product.stock)
+        except CartLimitError as e:
+            raise cart_limit_error(e, product.pk)
+        return Response({'product': product.pk, 'quantity': quantity})
+
+    def list(self, request):
+        items = cart_store().items(request.user.pk)
+        return Response([
+            {'product': product_id, 'quantity': quantity}
+            for product_id, quantity in sorted(items.items())
+        ])
+
+    @swagger_auto_schema(request_body=HotCartItemSerializer)
+    def create(self, request):
+        """Add units of a product to the cart."""
+        serializer = HotCartItemSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        response = self.write(
+            cart_store().add, serializer.validated_data['product'], serializer.validated_data['quantity']
+        )
+        response.status_code = status.HTTP_201_CREATED
+        return response
+
+    @swagger_auto_schema(request_body=HotCartQuantitySerializer)
+    def partial_update(self, request, pk=None):
+        """Set the quantity of a product, `pk` being the product id."""
+        serializer = HotCartQuantitySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        product = get_object_or_404(Product.objects.only('pk', 'stock'), pk=pk)
+        return self.write(cart_store().set, product, serializer.validated_data['quantity'])
+
+    def destroy(self, request, pk=None):
+        try:
+            removed = cart_store().remove(request.user.pk, int(pk))
+        except (TypeError, ValueError):
+            removed = False
+        if not removed:
+            raise NotFound()
+        return Response(status=status.HTTP_204_NO_CONTENT)
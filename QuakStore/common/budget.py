@@ -0,0 +1,151 @@
+"""
+Per view SQL query budgets.
+
+Views declare the most queries one request may run as `query_budget`,
+either a number or a dict per action (per lowercase method for plain
+views), and optionally a `statement_timeout` in milliseconds the same
+way. `QueryBudgetMiddleware` applies the timeouts and, on a sample of the
+requests, counts the queries and logs the views going over budget.
+"""
+import logging
+import random
+from contextlib import contextmanager
+from typing import Any, Callable
+
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCounter:
+    def __init__(self) -> None:
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def count_queries(using: str = 'default'):
+    """Count the queries run in the block, whatever `DEBUG` is."""
+    counter = QueryCounter()
+    with connections[using].execute_wrapper(counter):
+        yield counter
+
+
+class RequestQueries(QueryCounter):
+    """
+    Execute wrapper counting the queries of one request once `counting`
+    is on, and setting the statement timeout right before the first of
+    them, so requests answered from the cache run no SQL at all.
+    """
+    def __init__(self, using: str = 'default') -> None:
+        super().__init__()
+        self.connection = connections[using]
+        self.budget: int | None = None
+        self.timeout: int | None = None
+        self.timeout_set = False
+        self.counting = False
+        self.view = ''
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.timeout and not self.timeout_set and self.connection.vendor == 'postgresql':
+            self.run("SET statement_timeout = %d" % int(self.timeout))
+            self.timeout_set = True
+        if self.counting:
+            self.count += 1
+        return execute(sql, params, many, context)
+
+    def reset(self) -> None:
+        """Put the connection's statement timeout back if it was changed."""
+        if not self.timeout_set:
+            return
+        self.timeout_set = False
+        if self.connection.connection is None:
+            return
+        try:
+            self.run("RESET statement_timeout")
+        except self.connection.Database.Error:
+            # never leave the timeout behind on a reused connection
+            self.connection.close()
+
+    def run(self, sql: str) -> None:
+        # straight through the driver, past the execute wrappers and the
+        # query log, whatever cursor the wrapped query runs on
+        with self.connection.connection.cursor() as cursor:
+            cursor.execute(sql)
+
+
+def view_action(view_func: Callable, method: str) -> str:
+    """The viewset action `view_func` runs for `method`, or the method itself."""
+    actions = getattr(view_func, 'actions', None) or {}
+    return actions.get(method.lower(), method.lower())
+
+
+def view_setting(view_func: Callable, name: str, action: str) -> Any:
+    view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+    value = getattr(view_class, name, None)
+    if isinstance(value, dict):
+        return value.get(action)
+    return value
+
+
+class QueryBudgetMiddleware:
+    """
+    The view runs through the regular handler, atomic requests and the
+    other middlewares' exception handling included; `process_view` only
+    records its budget and timeout. Streamed responses keep both until
+    their content is consumed.
+    """
+    def __init__(self, get_response) -> None:
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = RequestQueries()
+        request._queries = queries
+        with queries.connection.execute_wrapper(queries):
+            response = self.get_response(request)
+
+        if response.streaming and (queries.timeout or queries.counting):
+            response.streaming_content = self.stream(request, response.streaming_content, queries)
+        else:
+            self.finish(request, queries)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        queries = getattr(request, '_queries', None)
+        if queries is None:
+            return None
+        action = view_action(view_func, request.method)
+        budget = view_setting(view_func, 'query_budget', action)
+        queries.timeout = view_setting(view_func, 'statement_timeout', action)
+        if budget is not None and random.random() < settings.QUERY_BUDGET_SAMPLE_RATE:
+            queries.budget = budget
+            queries.counting = True
+            queries.view = f"{getattr(view_func, '__name__', view_func)}.{action}"
+        return None
+
+    def stream(self, request, content, queries: RequestQueries):
+        try:
+            with queries.connection.execute_wrapper(queries):
+                yield from content
+        finally:
+            self.finish(request, queries)
+
+    def finish(self, request, queries: RequestQueries) -> None:
+        queries.reset()
+        if not queries.counting:
+            return
+        queries.counting = False
+        if queries.count > queries.budget:
+            logger.warning(
+                "%s %s ran %d queries, over its query budget of %d (%s)",
+                request.method, request.path, queries.count, queries.budget, queries.view,
+                extra={
+                    'path': request.path, 'view': queries.view,
+                    'queries': queries.count, 'budget': queries.budget,
+                },
+            )
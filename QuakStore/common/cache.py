@@ -0,0 +1,113 @@
+"""
+Tag invalidated response cache.
+
+Every entry is stored with the versions of the tags it was built from
+(`product:1`, `category:3`, ...). Invalidating a tag bumps its version, so
+only the entries that contain it miss on their next read.
+"""
+import time
+from collections.abc import Iterable
+from hashlib import md5
+from typing import Any, Callable
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.request import Request
+
+
+TAG_PREFIX = 'cache-tag:'
+
+
+def _tag_key(tag: str) -> str:
+    return f"{TAG_PREFIX}{tag}"
+
+
+def request_cache_key(request: Request, prefix: str = 'catalog', params: Iterable[str] | None = None) -> str:
+    """
+    Cache key for a user independent response, built from the host, the
+    path and the query parameters in a normalized order, only the `params`
+    ones when given.
+    """
+    params = sorted(
+        (key, value)
+        for key in request.query_params
+        if params is None or key in params
+        for value in request.query_params.getlist(key)
+    )
+    url = f"{request.scheme}://{request.get_host()}{request.path}?{urlencode(params)}"
+    return f"{prefix}:{md5(url.encode()).hexdigest()}"
+
+
+def tag_versions(tags: Iterable[str]) -> dict[str, int]:
+    keys = {_tag_key(tag): tag for tag in set(tags)}
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    for key in missing:
+        cache.add(key, time.time_ns(), None)
+    if missing:
+        versions.update(cache.get_many(missing))
+    return {keys[key]: version for key, version in versions.items()}
+
+
+def etag_for(*parts: Any) -> str:
+    return '"' + md5(repr(parts).encode()).hexdigest() + '"'
+
+
+def get_tagged(key: str) -> tuple[Any, str] | None:
+    """
+    The cached data and its ETag, or `None` when missing or when one of
+    its tags was invalidated since.
+    """
+    entry = cache.get(key)
+    if entry is None:
+        return None
+    data, versions, etag = entry
+    if versions:
+        current = cache.get_many([_tag_key(tag) for tag in versions])
+        for tag, version in versions.items():
+            if current.get(_tag_key(tag)) != version:
+                return None
+    return data, etag
+
+
+def set_tagged(key: str, data: Any, tags: Iterable[str], timeout: int) -> str:
+    """
+    Cache `data` under the current versions of `tags`, returns its ETag,
+    which only changes when one of the tags is invalidated.
+    """
+    versions = tag_versions(tags)
+    etag = etag_for(key, sorted(versions.items()))
+    cache.set(key, (data, versions, etag), timeout)
+    return etag
+
+
+def invalidate_tags(*tags: str) -> None:
+    """
+    Bump the version of the given tags once the current transaction
+    commits, so a concurrent request can't cache the old rows again.
+    """
+    def bump():
+        for tag in set(tags):
+            try:
+                cache.incr(_tag_key(tag))
+            except ValueError:
+                # never cached or evicted, entries holding it already miss
+                pass
+    transaction.on_commit(bump)
+
+
+def get_or_build(
+    request: Request, build: Callable[[], tuple[Any, Iterable[str]]], timeout: int, prefix: str = 'catalog',
+    params: Iterable[str] | None = None
+) -> tuple[Any, str]:
+    """
+    Serve the cached data of a request and its ETag, or `build()` it and
+    cache it under the tags it returns.
+    """
+    key = request_cache_key(request, prefix, params)
+    entry = get_tagged(key)
+    if entry is None:
+        data, tags = build()
+        entry = data, set_tagged(key, data, tags, timeout)
+    return entry
@@ -0,0 +1,29 @@
+from collections.abc import Callable
+from datetime import datetime
+
+from django.http import HttpResponseBase
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from rest_framework.request import Request
+
+
+def conditional_response(
+    request: Request,
+    build_response: Callable[[], HttpResponseBase],
+    etag: str | None = None,
+    last_modified: datetime | None = None,
+) -> HttpResponseBase:
+    """
+    Answer with 304 when the client's validators still match, otherwise
+    build the response. Both carry the ETag and Last-Modified headers.
+    """
+    timestamp = int(last_modified.timestamp()) if last_modified is not None else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is None:
+        response = build_response()
+    if etag is not None:
+        response['ETag'] = etag
+    if timestamp is not None:
+        response['Last-Modified'] = http_date(timestamp)
+    return response
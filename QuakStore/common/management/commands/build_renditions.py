@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+
+from common.renditions import build_renditions, needs_renditions
+from product.models import ProductImage, Category
+
+
+class Command(BaseCommand):
+    help = "Render the missing WebP/JPEG renditions of product images, category icons and avatars"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Re-render every rendition")
+
+    def handle(self, *args, **options):
+        sources = [
+            (ProductImage, 'url'),
+            (Category, 'icon'),
+            (get_user_model(), 'avatar'),
+        ]
+        for model, field_name in sources:
+            count = 0
+            queryset = model.objects.exclude(**{field_name: ''}).exclude(**{f"{field_name}__isnull": True})
+            for instance in queryset.only('pk', field_name, 'renditions').iterator():
+                if options['all'] or needs_renditions(instance, field_name):
+                    build_renditions(model, instance.pk, field_name)
+                    count += 1
+            self.stdout.write(self.style.SUCCESS(f"Rendered {count} {model._meta.verbose_name_plural}"))
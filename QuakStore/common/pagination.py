@@ -0,0 +1,93 @@
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework.pagination import BasePagination, PageNumberPagination, CursorPagination
+from rest_framework.filters import SearchFilter
+from rest_framework.exceptions import ValidationError
+
+
+class KeysetPagination(CursorPagination):
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-date_added', '-id')
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        # the cursor position is taken from the first field, the primary key
+        # only breaks ties so the page boundaries stay deterministic
+        if not any(field.lstrip('-') in ('id', 'pk') for field in ordering):
+            descending = ordering[0].startswith('-')
+            ordering = ordering + ('-id' if descending else 'id',)
+        return ordering
+
+
+class PageOrCursorPagination(BasePagination):
+    """
+    Page number pagination by default, keyset (cursor) pagination when the
+    client passes `?pagination=cursor` or follows a `cursor` link. Keyset
+    pages don't issue a COUNT(*) and cost the same at any depth. Search
+    results are only paginated by page number: the cursor would replace
+    their ordering by relevance with its own.
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-date_added', '-id')
+
+    mode_query_param = 'pagination'
+    page_number_class = PageNumberPagination
+    cursor_class = KeysetPagination
+
+    def use_cursor(self, request) -> bool:
+        return (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or self.cursor_class.cursor_query_param in request.query_params
+        )
+
+    def searching(self, request, view) -> bool:
+        return any(
+            issubclass(backend, SearchFilter) and backend().get_search_terms(request)
+            for backend in getattr(view, 'filter_backends', ())
+        )
+
+    def get_paginator(self, request):
+        if self.use_cursor(request):
+            paginator = self.cursor_class()
+            paginator.ordering = self.ordering
+        else:
+            paginator = self.page_number_class()
+        paginator.page_size = self.page_size
+        paginator.page_size_query_param = self.page_size_query_param
+        paginator.max_page_size = self.max_page_size
+        return paginator
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.use_cursor(request) and self.searching(request, view):
+            raise ValidationError({
+                self.mode_query_param: [_("Search results are ordered by relevance and can only be paginated by page")]
+            })
+        self.paginator = self.get_paginator(request)
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.page_number_class().get_paginated_response_schema(schema)
+
+    def to_html(self):
+        return self.paginator.to_html()
+
+    def get_results(self, data):
+        return data['results']
+
+    def get_schema_operation_parameters(self, view):
+        return self.page_number_class().get_schema_operation_parameters(view) + [
+            {
+                'name': self.mode_query_param,
+                'required': False,
+                'in': 'query',
+                'description': "Set to 'cursor' for keyset pagination",
+                'schema': {'type': 'string', 'enum': ['page', 'cursor']},
+            },
+        ]
@@ -0,0 +1,193 @@
+"""
+Background image rendering. The PIL work runs in a process pool and the
+storage round trips in a thread pool, so neither happens inside a request.
+"""
+import logging
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from io import BytesIO
+from os.path import basename, splitext
+from typing import Callable
+
+from PIL import Image
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+
+
+logger = logging.getLogger(__name__)
+
+RENDITION_WIDTHS = (150, 300, 600, 1200)
+# rendition format -> (PIL format, quality), webp first as the preferred one
+RENDITION_FORMATS = {
+    'webp': ('WEBP', 80),
+    'jpeg': ('JPEG', 85),
+}
+RENDITIONS_DIR = 'uploads/renditions/'
+
+_process_pool: ProcessPoolExecutor | None = None
+_thread_pool: ThreadPoolExecutor | None = None
+
+
+def render_image(data: bytes, size: tuple[int, int], format: str = 'JPEG', quality: int = 85) -> bytes:
+    img = Image.open(BytesIO(data))
+    img = img.convert('RGB')
+    img.thumbnail(size)
+
+    output = BytesIO()
+    img.save(output, format, quality=quality)
+    return output.getvalue()
+
+
+def render_rendition(data: bytes, width: int, format: str, quality: int) -> tuple[bytes, int]:
+    """
+    Scale an image down to `width` (never up), returns the encoded bytes
+    and the resulting width.
+    """
+    img = Image.open(BytesIO(data))
+    img = img.convert('RGB')
+    img.thumbnail((width, img.height))
+
+    output = BytesIO()
+    img.save(output, format, quality=quality)
+    return output.getvalue(), img.width
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(
+            max_workers=settings.RENDITION_WORKERS,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+    return _process_pool
+
+
+def get_thread_pool() -> ThreadPoolExecutor:
+    global _thread_pool
+    if _thread_pool is None:
+        _thread_pool = ThreadPoolExecutor(
+            max_workers=settings.RENDITION_WORKERS,
+            thread_name_prefix='renditions'
+        )
+    return _thread_pool
+
+
+def encode(data: bytes, size: tuple[int, int], format: str = 'JPEG', quality: int = 85) -> bytes:
+    if not settings.RENDITIONS_ASYNC:
+        return render_image(data, size, format, quality)
+    return get_process_pool().submit(render_image, data, size, format, quality).result()
+
+
+def encode_renditions(data: bytes) -> dict[str, dict[int, bytes]]:
+    """
+    Encode every rendition width and format of an image, in parallel when
+    running async. Widths above the original collapse into one rendition.
+    """
+    jobs = [
+        (name, width, pil_format, quality)
+        for name, (pil_format, quality) in RENDITION_FORMATS.items()
+        for width in RENDITION_WIDTHS
+    ]
+    if settings.RENDITIONS_ASYNC:
+        pool = get_process_pool()
+        futures = [pool.submit(render_rendition, data, width, pil_format, quality) for _, width, pil_format, quality in jobs]
+        results = [future.result() for future in futures]
+    else:
+        results = [render_rendition(data, width, pil_format, quality) for _, width, pil_format, quality in jobs]
+
+    renditions: dict[str, dict[int, bytes]] = {name: {} for name in RENDITION_FORMATS}
+    for job, (encoded, width) in zip(jobs, results):
+        renditions[job[0]].setdefault(width, encoded)
+    return renditions
+
+
+def build_renditions(model, pk: int, field_name: str) -> dict:
+    """
+    Render and store the renditions of an image field, then record them in
+    the `renditions` JSON field of the instance as
+    `{"source": name, "webp": {width: name}, "jpeg": {width: name}}`.
+    """
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None:
+        return {}
+    image = getattr(instance, field_name)
+    previous = instance.renditions or {}
+    if not image or image.name.lower().endswith('.svg'):
+        model.objects.filter(pk=pk).update(renditions={})
+        delete_renditions(previous)
+        return {}
+
+    with image.open('rb') as source:
+        encoded = encode_renditions(source.read())
+
+    stem = splitext(basename(image.name))[0]
+    renditions = {'source': image.name}
+    for name, sizes in encoded.items():
+        renditions[name] = {
+            str(width): default_storage.save(f"{RENDITIONS_DIR}{stem}_{width}.{name}", ContentFile(data))
+            for width, data in sizes.items()
+        }
+    # update() so the model save signals don't run for derived files
+    model.objects.filter(pk=pk).update(renditions=renditions)
+    delete_renditions(previous, keep=renditions)
+    return renditions
+
+
+def rendition_files(renditions: dict) -> set[str]:
+    return {name for format in RENDITION_FORMATS for name in renditions.get(format, {}).values()}
+
+
+def delete_renditions(renditions: dict, keep: dict | None = None) -> None:
+    """Delete the stored files of `renditions`, except the ones `keep` still uses."""
+    for name in rendition_files(renditions) - rendition_files(keep or {}):
+        default_storage.delete(name)
+
+
+def needs_renditions(instance, field_name: str) -> bool:
+    image = getattr(instance, field_name)
+    source = (instance.renditions or {}).get('source')
+    if not image:
+        return bool(source)
+    return image.name != source
+
+
+def srcset(renditions: dict, request=None) -> dict | None:
+    """
+    The stored renditions as `{format: [{"width": w, "url": url}, ...]}`,
+    smallest first, or `None` while they are not rendered yet.
+    """
+    if not renditions or not any(renditions.get(name) for name in RENDITION_FORMATS):
+        return None
+    prefix = ''
+    if settings.DEBUG and request is not None:
+        prefix = f"{request.scheme}://{request.get_host()}"
+    return {
+        name: [
+            {'width': int(width), 'url': prefix + default_storage.url(file_name)}
+            for width, file_name in sorted(renditions.get(name, {}).items(), key=lambda item: int(item[0]))
+        ]
+        for name in RENDITION_FORMATS
+    }
+
+
+def _run_job(job: Callable, *args) -> None:
+    try:
+        job(*args)
+    except Exception:
+        logger.exception("Rendition job %s failed", job.__name__)
+    finally:
+        close_old_connections()
+
+
+def submit(job: Callable, *args) -> None:
+    """
+    Run a rendition job in the background, or inline when
+    `RENDITIONS_ASYNC` is off (tests, management commands).
+    """
+    if not settings.RENDITIONS_ASYNC:
+        job(*args)
+        return
+    get_thread_pool().submit(_run_job, job, *args)
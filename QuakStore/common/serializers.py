@@ -0,0 +1,95 @@
+from functools import cached_property
+
+from rest_framework import serializers
+from rest_framework.request import Request
+
+
+FIELDS_PARAM = 'fields'
+EXCLUDE_PARAM = 'exclude'
+
+
+def _split(value: str) -> list[str]:
+    return [part.strip() for part in value.split(',') if part.strip()]
+
+
+def sparse_fieldset(request: Request | None, path: str = '') -> tuple[set[str] | None, set[str]]:
+    """
+    The `(included, excluded)` field names asked for the serializer at the
+    dotted `path` of the response (`''` for the top level, `product`,
+    `items.product`, ...). `included` is `None` when nothing restricts it,
+    the `id` is always included.
+    """
+    if request is None:
+        return None, set()
+    params = request.query_params
+    prefix = f"{path}." if path else ''
+
+    included = None
+    if params.get(FIELDS_PARAM):
+        names = set()
+        whole = False
+        for value in _split(params[FIELDS_PARAM]):
+            if path and value == path:
+                whole = True
+            elif value.startswith(prefix):
+                names.add(value[len(prefix):].split('.')[0])
+        if names and not whole:
+            included = names | {'id'}
+
+    excluded = {
+        value[len(prefix):]
+        for value in _split(params.get(EXCLUDE_PARAM, ''))
+        if value.startswith(prefix) and '.' not in value[len(prefix):]
+    }
+    excluded.discard('id')
+    return included, excluded
+
+
+def field_requested(request: Request | None, name: str, path: str = '') -> bool:
+    """Whether the `name` field of the serializer at `path` is serialized."""
+    included, excluded = sparse_fieldset(request, path)
+    return (included is None or name in included) and name not in excluded
+
+
+class SparseFieldsetMixin:
+    """
+    Serializes only the fields asked through `?fields=` and `?exclude=`,
+    comma separated with dotted paths for nested serializers, e.g.
+    `?fields=id,product.name,product.price`.
+    """
+    @cached_property
+    def sparse_path(self) -> str:
+        parts = []
+        node = self
+        while node.parent is not None:
+            if node.field_name:
+                parts.append(node.field_name)
+            node = node.parent
+        return '.'.join(reversed(parts))
+
+    @cached_property
+    def sparse_fieldset(self) -> tuple[set[str] | None, set[str]]:
+        return sparse_fieldset(self.context.get('request'), self.sparse_path)
+
+    @property
+    def _readable_fields(self):
+        included, excluded = self.sparse_fieldset
+        for field in super()._readable_fields:
+            if field.field_name in excluded:
+                continue
+            if included is None or field.field_name in included:
+                yield field
+
+
+class CommaSeparatedListField(serializers.ListField):
+    """A list given as `?name=a,b,c` in the query string, or as a list."""
+    def get_value(self, dictionary):
+        value = dictionary.get(self.field_name, serializers.empty)
+        if isinstance(value, str):
+            return _split(value)
+        return value
+
+    def to_internal_value(self, data):
+        if isinstance(data, str):
+            data = _split(data)
+        return super().to_internal_value(data)
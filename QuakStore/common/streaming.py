@@ -0,0 +1,52 @@
+from collections.abc import Callable, Iterable, Iterator
+from itertools import islice
+from typing import Any
+
+from django.db.models import QuerySet
+from django.http import StreamingHttpResponse
+
+from rest_framework.decorators import action
+
+from .renderers import dumps
+from .throttles import BurstThrottle, RapidThrottle
+
+
+def stream_json_list(items: Iterable, serialize_batch: Callable[[list], list], batch_size: int = 500) -> Iterator[bytes]:
+    """
+    Encode a JSON array incrementally, `batch_size` items at a time, so the
+    first bytes go out before the whole list is loaded or serialized.
+    """
+    if isinstance(items, QuerySet):
+        items = items.iterator(chunk_size=batch_size)
+    iterator = iter(items)
+
+    yield b'['
+    first = True
+    while batch := list(islice(iterator, batch_size)):
+        for data in serialize_batch(batch):
+            yield (b'' if first else b',') + dumps(data)
+            first = False
+    yield b']'
+
+
+class StreamingJSONResponse(StreamingHttpResponse):
+    def __init__(self, streaming_content: Iterator[bytes] = (), **kwargs: Any) -> None:
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(streaming_content, **kwargs)
+
+
+class StreamingExportMixin:
+    """
+    Adds an `export` action streaming every row of the filtered queryset
+    as one JSON array, without pagination.
+    """
+    stream_batch_size = 500
+
+    @action(methods=['get'], detail=False, throttle_classes=[BurstThrottle, RapidThrottle])
+    def export(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return StreamingJSONResponse(stream_json_list(
+            queryset,
+            lambda batch: self.get_serializer(batch, many=True).data,
+            self.stream_batch_size
+        ))
@@ -0,0 +1,211 @@
+"""
+N+1 regression suite: every read endpoint, list, detail and export, is
+requested for 1 and for 100 rows, the query count must not grow with the
+rows and must stay within the view's query budget. The detail endpoints
+are requested for a product with 1 and with 100 reviews, and an order with
+1 and with 100 lines. The category index, the autocomplete, the users and
+the payment methods (kept by Stripe, not in the database) are the same for
+both sizes and are only held to their budget. The hot cart, only routed with
+`CART_BACKEND = "redis"`, is requested through its view.
+"""
+import logging
+
+import fakeredis
+import pytest
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+
+from cart import store as cart_stores
+from cart.models import CartItem
+from cart.store import RedisCartStore
+from cart.views import CartPagination, HotCartViewSet
+from favorites.models import Favorite
+from orders.models import Order, OrderItem
+from product.models import Product, Category, Discount, ProductImage
+from reviews.models import Review
+
+from .budget import count_queries, RequestQueries
+
+User = get_user_model()
+
+SIZES = (1, 100)
+# product i has STOCK + i in stock, so a stock range selects `size` of them
+STOCK = 120
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def cart_page_size(monkeypatch):
+    # the cart pages are capped well below the largest size
+    monkeypatch.setattr(CartPagination, 'max_limit', max(SIZES))
+
+
+@pytest.fixture
+def catalog(db):
+    """
+    100 products, and for each size a user owning that many favorites,
+    cart lines, orders and order lines, and a product with that many
+    reviews.
+    """
+    category = Category.objects.create(name="category", slug="category")
+    discount = Discount.objects.create(name='sale', percent=10)
+    products = [
+        Product.objects.create(
+            category=category, name=f'product {i}', slug=f'product-{i}', price=1200, stock=STOCK + i, discount=discount
+        )
+        for i in range(max(SIZES))
+    ]
+    ProductImage.objects.bulk_create([ProductImage(product=product) for product in products])
+
+    users = {}
+    orders = {}
+    reviewed = {}
+    reviews = {}
+    for size in SIZES:
+        user = User.objects.create(username=f'user{size}', email=f'user{size}@gmail.com', password='123sss123')
+        users[size] = user
+        Favorite.objects.bulk_create([Favorite(user=user, product=product) for product in products[:size]])
+        CartItem.objects.bulk_create([CartItem(user=user, product=product, quantity=1) for product in products[:size]])
+        for _ in range(size):
+            order = Order.objects.create(owner=user, total=1080)
+            OrderItem.objects.create(order=order, product=products[0], quantity=1)
+        order = Order.objects.create(owner=user, total=1080 * size)
+        OrderItem.objects.bulk_create([OrderItem(order=order, product=product, quantity=1) for product in products[:size]])
+        orders[size] = order
+
+        product = products[size - 1]
+        reviewers = [
+            User.objects.create(username=f'reviewer{size}-{i}', email=f'reviewer{i}@gmail.com', password='123sss123')
+            for i in range(size)
+        ]
+        Review.objects.bulk_create([Review(user=reviewer, product=product, rating=4, comment="wow") for reviewer in reviewers])
+        reviewed[size] = product
+        reviews[size] = Review.objects.filter(product=product).first()
+
+    return {'category': category, 'products': products, 'users': users, 'orders': orders, 'reviewed': reviewed, 'reviews': reviews}
+
+
+ENDPOINTS = {
+    'products': lambda data, size: reverse('products-list') + f'?page_size={size}',
+    'products-export': lambda data, size: reverse('products-export') + f'?stock__lte={STOCK + size - 1}',
+    'product': lambda data, size: reverse(
+        'product-detail', args=[data['category'].slug, data['reviewed'][size].slug]
+    ),
+    'products-batch': lambda data, size: reverse('products-batch') + '?ids=' + ','.join(
+        str(product.pk) for product in data['products'][:size]
+    ),
+    'category': lambda data, size: reverse('category-detail', args=[data['category'].slug]) + f'?page_size={size}',
+    'categories': lambda data, size: reverse('category-list'),
+    'autocomplete': lambda data, size: reverse('autocomplete') + '?q=product',
+    'favorites': lambda data, size: reverse('favorites-list') + f'?page_size={size}',
+    'cart': lambda data, size: reverse('cartitems-list') + f'?limit={size}',
+    'cart-summary': lambda data, size: reverse('cartitems-summary'),
+    'payment-methods': lambda data, size: reverse('payment-methods-list'),
+    'users': lambda data, size: reverse('user-list'),
+    'user': lambda data, size: reverse('user-me'),
+    'orders': lambda data, size: reverse('orders-list') + f'?page_size={size}',
+    'orders-export': lambda data, size: reverse('orders-export'),
+    'order': lambda data, size: reverse('orders-detail', args=[data['orders'][size].pk]),
+    'reviews': lambda data, size: reverse(
+        'reviews-list', args=[data['category'].slug, data['reviewed'][size].slug]
+    ) + f'?page_size={size}',
+    'review': lambda data, size: reverse(
+        'reviews-details', args=[data['category'].slug, data['reviewed'][size].slug, data['reviews'][size].pk]
+    ),
+}
+
+
+def queries_for(url: str, user) -> int:
+    cache.clear()
+    client = APIClient()
+    client.force_authenticate(user)
+    with count_queries() as counter:
+        response = client.get(url)
+        # streamed exports query as their content is consumed
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+    assert response.status_code == 200, content
+    return counter.count
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('endpoint', ENDPOINTS)
+@override_settings(QUERY_BUDGET_SAMPLE_RATE=1)
+def test_queries_do_not_grow_with_rows(endpoint, catalog, caplog):
+    url = ENDPOINTS[endpoint]
+    with caplog.at_level(logging.WARNING, logger='common.budget'):
+        counts = {size: queries_for(url(catalog, size), catalog['users'][size]) for size in SIZES}
+
+    assert counts[1] == counts[100], counts
+    assert not [record for record in caplog.records if record.name == 'common.budget']
+
+
+@pytest.mark.django_db
+@override_settings(CART_BACKEND='redis')
+def test_hot_cart_queries_do_not_grow_with_rows(catalog, monkeypatch):
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(cart_stores.redis.Redis, 'from_url', lambda url: fakeredis.FakeRedis(server=server))
+    monkeypatch.setattr(cart_stores, '_store', RedisCartStore('redis://cart'))
+    view = HotCartViewSet.as_view({'get': 'list'})
+
+    counts = {}
+    for size in SIZES:
+        request = APIRequestFactory().get('/cart/products/')
+        force_authenticate(request, catalog['users'][size])
+        with count_queries() as counter:
+            response = view(request)
+        assert response.status_code == 200
+        assert len(response.data) == size
+        counts[size] = counter.count
+
+    assert counts[1] == counts[100], counts
+
+
+@pytest.fixture
+def timeout_statements(monkeypatch):
+    """The statements the budget middleware sends to set and reset timeouts."""
+    statements = []
+    run = RequestQueries.run
+
+    def record(self, sql):
+        statements.append(sql.split(' = ')[0])
+        run(self, sql)
+
+    monkeypatch.setattr(RequestQueries, 'run', record)
+    return statements
+
+
+@pytest.mark.django_db
+def test_statement_timeout_is_only_set_when_the_view_queries(catalog, timeout_statements):
+    client = APIClient()
+    url = reverse('products-list')
+
+    assert client.get(url).status_code == 200
+    assert timeout_statements == ['SET statement_timeout', 'RESET statement_timeout']
+
+    timeout_statements.clear()
+    with count_queries() as counter:
+        assert client.get(url).status_code == 200
+    assert counter.count == 0
+    assert timeout_statements == []
+
+
+@pytest.mark.django_db
+def test_statement_timeout_covers_streamed_exports(catalog, timeout_statements):
+    response = APIClient().get(reverse('products-export'))
+    assert response.status_code == 200
+    assert timeout_statements == []
+
+    content = b''.join(response.streaming_content)
+    response.close()
+    assert content.startswith(b'[')
+    assert timeout_statements == ['SET statement_timeout', 'RESET statement_timeout']
@@ -0,0 +1,171 @@
+import pytest
+import json
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+from io import BytesIO
+
+from PIL import Image
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import override_settings
+
+from .cache import get_tagged, set_tagged, invalidate_tags
+from .renderers import dumps
+from .streaming import stream_json_list
+from .serializers import sparse_fieldset, field_requested
+from .lru import LRUCache
+from .renditions import build_renditions, rendition_files
+
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from product.models import Category
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.mark.django_db
+def test_tagged_entry_is_served_until_invalidated(django_capture_on_commit_callbacks):
+    etag = set_tagged('entry', {'id': 1}, ['product:1', 'category:1'], 60)
+    assert get_tagged('entry') == ({'id': 1}, etag)
+    
+    # the versions are bumped once the transaction commits
+    with django_capture_on_commit_callbacks(execute=True):
+        invalidate_tags('product:1')
+    assert get_tagged('entry') is None
+
+@pytest.mark.django_db
+def test_invalidation_only_purges_affected_entries(django_capture_on_commit_callbacks):
+    set_tagged('first', 'first', ['product:1'], 60)
+    set_tagged('second', 'second', ['product:2'], 60)
+    
+    with django_capture_on_commit_callbacks(execute=True):
+        invalidate_tags('product:1')
+    
+    assert get_tagged('first') is None
+    assert get_tagged('second')[0] == 'second'
+
+@pytest.mark.django_db
+def test_etag_changes_with_tags(django_capture_on_commit_callbacks):
+    first = set_tagged('entry', 'data', ['product:1'], 60)
+    assert set_tagged('entry', 'data', ['product:1'], 60) == first
+    
+    with django_capture_on_commit_callbacks(execute=True):
+        invalidate_tags('product:1')
+    assert set_tagged('entry', 'data', ['product:1'], 60) != first
+
+@pytest.mark.django_db
+def test_evicted_tag_misses():
+    set_tagged('entry', 'data', ['product:1'], 60)
+    cache.delete('cache-tag:product:1')
+    assert get_tagged('entry') is None
+
+def test_dumps_handles_decimal_uuid_and_datetime():
+    value = uuid.uuid4()
+    data = json.loads(dumps({
+        'avg_rating': Decimal('4.50'),
+        'uuid': value,
+        'date': datetime(2024, 10, 9, tzinfo=timezone.utc),
+    }))
+    
+    assert data['avg_rating'] == 4.5
+    assert data['uuid'] == str(value)
+    assert data['date'].startswith('2024-10-09T00:00:00')
+
+def test_stream_json_list_batches():
+    batches = []
+    def serialize(batch):
+        batches.append(batch)
+        return [{'id': item} for item in batch]
+    
+    content = b''.join(stream_json_list(range(5), serialize, batch_size=2))
+    
+    assert json.loads(content) == [{'id': i} for i in range(5)]
+    assert batches == [[0, 1], [2, 3], [4]]
+
+def test_stream_json_list_empty():
+    assert b''.join(stream_json_list([], lambda batch: batch)) == b'[]'
+
+
+def sparse_request(query: str) -> Request:
+    return Request(APIRequestFactory().get(f"/?{query}"))
+
+def test_sparse_fieldset_scopes_dotted_paths():
+    request = sparse_request('fields=name,product.price,product.category&exclude=product.description')
+    
+    assert sparse_fieldset(request) == ({'id', 'name', 'product'}, set())
+    assert sparse_fieldset(request, 'product') == ({'id', 'price', 'category'}, {'description'})
+    assert sparse_fieldset(request, 'product.category') == (None, set())
+
+def test_sparse_fieldset_keeps_whole_nested_serializer():
+    request = sparse_request('fields=id,product')
+    
+    assert sparse_fieldset(request, 'product') == (None, set())
+    assert field_requested(request, 'product')
+    assert not field_requested(request, 'user')
+
+def test_sparse_fieldset_never_excludes_id():
+    request = sparse_request('exclude=id,items')
+    
+    assert sparse_fieldset(request) == (None, {'items'})
+    assert not field_requested(request, 'items')
+    assert sparse_fieldset(None) == (None, set())
+
+
+def test_lru_cache_evicts_least_recently_used():
+    lru = LRUCache(maxsize=2, ttl=60)
+    lru.set('a', 1)
+    lru.set('b', 2)
+    assert lru.get('a') == 1
+    
+    lru.set('c', 3)
+    assert lru.get('b') is None
+    assert lru.get('a') == 1
+    assert lru.get_or_set('c', lambda: 4) == 3
+
+def test_lru_cache_entries_expire():
+    lru = LRUCache(maxsize=2, ttl=-1)
+    lru.set('a', 1)
+    assert lru.get('a') is None
+    assert len(lru) == 0
+
+
+def png(color: str) -> ContentFile:
+    output = BytesIO()
+    Image.new('RGB', (400, 200), color).save(output, 'PNG')
+    return ContentFile(output.getvalue())
+
+
+@pytest.mark.django_db
+@override_settings(
+    STORAGES={
+        'default': {'BACKEND': 'django.core.files.storage.InMemoryStorage'},
+        'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    },
+    RENDITIONS_ASYNC=False,
+)
+def test_rebuilt_renditions_replace_the_old_files():
+    category = Category.objects.create(name="category", slug="category")
+    category.icon.save('duck.png', png('yellow'))
+    first = build_renditions(Category, category.pk, 'icon')
+    assert first['webp'] and all(default_storage.exists(name) for name in rendition_files(first))
+
+    category.refresh_from_db()
+    category.icon.save('duck.png', png('blue'))
+    second = build_renditions(Category, category.pk, 'icon')
+
+    assert all(default_storage.exists(name) for name in rendition_files(second))
+    assert not any(default_storage.exists(name) for name in rendition_files(first))
+
+    category.refresh_from_db()
+    category.icon.delete()
+    assert build_renditions(Category, category.pk, 'icon') == {}
+    assert not any(default_storage.exists(name) for name in rendition_files(second))
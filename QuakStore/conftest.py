@@ -0,0 +1,53 @@
+"""
+Fixtures shared by the apps' tests. A module needing other data overrides
+`category` or `product`, the factory follows its `category`.
+"""
+import itertools
+
+import pytest
+
+from django.contrib.auth import get_user_model
+
+from product.models import Product, Category
+
+User = get_user_model()
+
+
+@pytest.fixture
+def user(db):
+    return User.objects.create(username='testuser', email='email@gmail.com', password='123sss123')
+
+
+@pytest.fixture
+def category(db):
+    return Category.objects.create(name="category", slug="category")
+
+
+@pytest.fixture
+def make_product(category):
+    """Creates a product in `category`, numbered unless named otherwise."""
+    numbers = itertools.count()
+
+    def make(**fields) -> Product:
+        number = next(numbers)
+        fields = {
+            'category': category,
+            'name': f'product {number}',
+            'slug': f'product-{number}',
+            'price': 1200,
+            'stock': 5,
+            **fields,
+        }
+        return Product.objects.create(**fields)
+
+    return make
+
+
+@pytest.fixture
+def product(make_product):
+    return make_product()
+
+
+@pytest.fixture
+def products(make_product):
+    return [make_product() for _ in range(3)]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.2 on 2026-10-18 10:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('favorites', '0002_alter_favorite_product_alter_favorite_user_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='favorite',
+            index=models.Index(fields=['user', '-date_added', '-id'], name='favorite_user_date_idx'),
+        ),
+    ]
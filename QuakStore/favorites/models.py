@@ -25,4 +25,7 @@ class Favorite(models.Model):
     class Meta:
         constraints = [
             models.UniqueConstraint(fields=['user', 'product'], name='unique_user_product_favorite')
+        ]
+        indexes = [
+            models.Index(fields=['user', '-date_added', '-id'], name='favorite_user_date_idx'),
         ]
\ No newline at end of file
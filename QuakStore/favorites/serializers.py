@@ -6,7 +6,9 @@ from .models import Favorite
 
 from product.serializers import ProductSerializer
 
-class FavoriteSerializer(serializers.ModelSerializer):
+from common.serializers import SparseFieldsetMixin
+
+class FavoriteSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     product = ProductSerializer(read_only=True, detail=False) 
     def __init__(self, instance=None, data=empty, detail=False, **kwargs):
         super().__init__(instance, data, **kwargs)
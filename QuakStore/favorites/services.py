@@ -0,0 +1,33 @@
+from collections.abc import Iterable
+
+from .models import Favorite
+
+
+def favorited_product_ids(user, product_ids: Iterable[int]) -> set[int]:
+    """
+    The subset of `product_ids` the user has favorited, answered from the
+    (user, product) unique index.
+    """
+    product_ids = list(product_ids)
+    if not product_ids or not user.is_authenticated:
+        return set()
+    return set(
+        Favorite.objects
+        .filter(user=user, product_id__in=product_ids)
+        .values_list('product_id', flat=True)
+    )
+
+
+def overlay_favorites(products: list[dict], user) -> set[int]:
+    """
+    Fill `is_favorite` on serialized products for the given user, products
+    stay `None` for anonymous users and are left alone when the field was
+    not asked for. Returns the favorited product ids.
+    """
+    products = [product for product in products if 'is_favorite' in product]
+    if not products or not user.is_authenticated:
+        return set()
+    favorited = favorited_product_ids(user, [product['id'] for product in products])
+    for product in products:
+        product['is_favorite'] = product['id'] in favorited
+    return favorited
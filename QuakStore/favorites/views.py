@@ -1,6 +1,5 @@
 from django.shortcuts import render
-from django.db.models import Prefetch, Count, Avg, DecimalField
-from django.db.models.functions import Cast
+from django.db.models import Prefetch
 
 from rest_framework import viewsets
 from rest_framework.permissions import IsAuthenticated
@@ -13,6 +12,8 @@ from .serializers import FavoriteSerializer, Favorite
 
 from product.views import ProductPagination
 from product.models import Product
+
+from common.serializers import sparse_fieldset, field_requested
 # Create your views here.
 
 
@@ -20,22 +21,16 @@ class FavoriteViewSet(viewsets.ModelViewSet):
     serializer_class= FavoriteSerializer
     permission_classes= [IsAuthenticated]
     pagination_class= ProductPagination
+    query_budget = {'list': 8, 'retrieve': 8}
     
     def get_queryset(self):
         queryset= Favorite.objects.filter(user= self.request.user)
-        queryset = queryset\
-        .prefetch_related(Prefetch(
+        if field_requested(self.request, 'product'):
+            queryset = queryset.prefetch_related(Prefetch(
                 'product',
-                Product.objects
-                .select_related('discount')
-                .prefetch_related('images')
-                .annotate(
-                    avg_rating=Cast(Avg('reviews__rating'),
-                    DecimalField(max_digits=5, decimal_places=2)),
-                    rating_count= Count('reviews')
-                )
-            )).order_by('-date_added')
-        return queryset
+                Product.objects.for_fields(*sparse_fieldset(self.request, 'product'))
+            ))
+        return queryset.order_by('-date_added', '-id')
     
     def get_serializer(self, *args, **kwargs):
         detail = False
@@ -6,6 +6,8 @@ from collections.abc import Sequence
 
 from .models import Order, User, OrderItem, Product
 
+from product.cache import invalidate_products
+
 from django.db.models import F
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
@@ -35,11 +37,12 @@ class OrderDTO:
         state = 'pending'
         owner = cart_items[0].user.pk
         for item in cart_items:
-            product = Product.objects.get(pk= item.product.pk)
+            # the cart items are selected for update along with their products
+            product = item.product
             if item.quantity > product.stock:
                 raise ValueError()
-            items.append(OrderItemDTO(item.product.pk, item.quantity))
-            total += item.quantity * item.product.discounted_price
+            items.append(OrderItemDTO(product.pk, item.quantity))
+            total += item.quantity * product.effective_price
         return OrderDTO(
             total=total,
             state=state,
@@ -74,6 +77,7 @@ class OrderAssembler:
             products.append(product)
 
         Product.objects.bulk_update(products, ["stock"])
+        invalidate_products(product.pk for product in products)
         if products:
             cart_items_to_remove = CartItem.objects.filter(
                 product_id__in=[product.id for product in products]
@@ -93,7 +97,9 @@ class OrderAssembler:
             product.stock += order_item.quantity
             products_to_restock.append(product)
         
-        return Product.objects.bulk_update(products_to_restock, ['stock'])
+        updated = Product.objects.bulk_update(products_to_restock, ['stock'])
+        invalidate_products(product.pk for product in products_to_restock)
+        return updated
     
     def cancel(self, order: Order):
         if order.state not in order.cancellable_states:
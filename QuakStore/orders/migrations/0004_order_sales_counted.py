@@ -0,0 +1,29 @@
+# Generated by Django 5.1.2 on 2026-10-18 20:00
+
+from django.db import migrations, models
+
+
+SOLD_STATES = ['paid', 'processing', 'shipping', 'completed', 'partial_refund']
+
+
+def mark_counted_sales(apps, schema_editor):
+    # the orders product.0008_productstats_sales counted
+    Order = apps.get_model('orders', 'Order')
+    Order.objects.filter(state__in=SOLD_STATES).update(sales_counted=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_order_owner_date_idx'),
+        ('product', '0008_productstats_sales'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='sales_counted',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(mark_counted_sales, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.1.2 on 2026-10-18 21:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def move_counted_sales(apps, schema_editor):
+    Order = apps.get_model('orders', 'Order')
+    OrderSale = apps.get_model('orders', 'OrderSale')
+    OrderSale.objects.bulk_create(
+        [OrderSale(order_id=pk) for pk in Order.objects.filter(sales_counted=True).values_list('pk', flat=True)],
+        batch_size=1000,
+    )
+
+
+def restore_counted_sales(apps, schema_editor):
+    Order = apps.get_model('orders', 'Order')
+    Order.objects.filter(sale__isnull=False).update(sales_counted=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_order_sales_counted'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderSale',
+            fields=[
+                ('order', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='sale', serialize=False, to='orders.order')),
+                ('date_added', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.RunPython(move_counted_sales, restore_counted_sales),
+        migrations.RemoveField(
+            model_name='order',
+            name='sales_counted',
+        ),
+    ]
@@ -36,6 +36,14 @@ class Order(models.Model):
         COMPLETED = 'completed', 'Completed'
 
     cancellable_states = [Status.PENDING]
+    # states counted in the product sales stats
+    sold_states = [
+        Status.PAID,
+        Status.PROCESSING,
+        Status.SHIPPING,
+        Status.COMPLETED,
+        Status.PARTIALLY_REFUNDED,
+    ]
     
     owner = models.ForeignKey(User, verbose_name=_(
         "Owner"), related_name='orders', on_delete=models.CASCADE)
@@ -65,6 +73,7 @@ class Order(models.Model):
     class Meta:
         indexes = [
             models.Index(fields=['payment_intent']),
+            models.Index(fields=['owner', '-date_added', '-id'], name='order_owner_date_idx'),
         ]
         ordering = ('-date_added',)
 
@@ -93,3 +102,14 @@ class OrderItem(models.Model):
             models.UniqueConstraint(
                 fields=['order', 'product'], name='unique_order_product')
         ]
+
+
+class OrderSale(models.Model):
+    """
+    An order the product sales stats count, see orders.signals. A row of its
+    own rather than a flag on `Order`, so saving a stale order can't undo it.
+    """
+    order = models.OneToOneField(
+        Order, related_name='sale', on_delete=models.CASCADE, primary_key=True)
+
+    date_added = models.DateTimeField(auto_now_add=True)
@@ -8,7 +8,9 @@ from product.serializers import ProductSerializer
 
 from payment.serializers import PaymentSerializer
 
-class OrderItemSerializer(serializers.ModelSerializer):
+from common.serializers import SparseFieldsetMixin
+
+class OrderItemSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     product = ProductSerializer(read_only=True)
     class Meta:
         model = OrderItem
@@ -32,7 +34,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
             )
         ]
         
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     payments = PaymentSerializer(many=True, read_only=True)
     
     def __init__(self, instance=None, data=empty, detail= False, **kwargs):
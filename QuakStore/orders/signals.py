@@ -0,0 +1,29 @@
+from django.dispatch import receiver
+from django.db.models.signals import post_save
+
+from product.models import ProductStats
+from product.cache import invalidate_products
+
+from .models import Order, OrderItem, OrderSale
+
+
+@receiver(post_save, sender=Order)
+def update_product_sales(sender, instance: Order, created: bool, *args, **kwargs):
+    # Decided by the rows the database inserted or deleted, not by the
+    # instance: of concurrent saves of the same transition, such as retried
+    # payment webhooks, only one counts or reverses the sale.
+    is_sold = instance.state in Order.sold_states
+    if is_sold:
+        _, flipped = OrderSale.objects.get_or_create(order=instance)
+    else:
+        flipped, _ = OrderSale.objects.filter(order=instance).delete()
+    if not flipped:
+        return
+
+    quantities = dict(
+        OrderItem.objects
+        .filter(order=instance, product__isnull=False)
+        .values_list('product_id', 'quantity')
+    )
+    ProductStats.apply_sales(quantities, 1 if is_sold else -1)
+    invalidate_products(quantities.keys())
@@ -1,3 +1,120 @@
-from django.test import TestCase
+import pytest
 
-# Create your tests here.
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from product.models import Product, ProductStats, Discount
+from cart.models import CartItem
+from payment.models import Payment
+
+from .models import Order, OrderItem
+from .dto import OrderDTO
+
+
+@pytest.mark.django_db
+class TestProductSales:
+    @pytest.fixture
+    def order(self, user, product):
+        order = Order.objects.create(owner=user, total=3600)
+        OrderItem.objects.create(order=order, product=product, quantity=3)
+        return Order.objects.get(pk=order.pk)
+    
+    def test_pending_order_is_not_counted(self, order, product):
+        stats = ProductStats.objects.get(product=product)
+        assert stats.order_count == 0
+        assert stats.units_sold == 0
+    
+    def test_paid_order_is_counted_once(self, order, product):
+        order.state = Order.Status.PAID
+        order.save()
+        order.state = Order.Status.SHIPPING
+        order.save()
+        
+        stats = ProductStats.objects.get(product=product)
+        assert stats.order_count == 1
+        assert stats.units_sold == 3
+    
+    def test_concurrent_paid_saves_count_once(self, order, product):
+        # a retried webhook loaded the order before the first one saved it
+        retry = Order.objects.get(pk=order.pk)
+        for instance in (order, retry):
+            instance.state = Order.Status.PAID
+            instance.save()
+
+        stats = ProductStats.objects.get(product=product)
+        assert stats.order_count == 1
+        assert stats.units_sold == 3
+
+    def test_refund_reverses_the_sale(self, order, product):
+        order.state = Order.Status.PAID
+        order.save()
+        order.state = Order.Status.REFUNDED
+        order.save()
+        
+        stats = ProductStats.objects.get(product=product)
+        assert stats.order_count == 0
+        assert stats.units_sold == 0
+
+    def test_stale_refund_reverses_the_sale(self, order, product):
+        # loaded before the payment was counted
+        stale = Order.objects.get(pk=order.pk)
+        order.state = Order.Status.PAID
+        order.save()
+        stale.state = Order.Status.REFUNDED
+        stale.save()
+
+        stats = ProductStats.objects.get(product=product)
+        assert stats.order_count == 0
+        assert stats.units_sold == 0
+
+
+@pytest.mark.django_db
+def test_order_total_uses_effective_price(user, category):
+    discount = Discount.objects.create(name='sale', percent=10)
+    product = Product.objects.create(category=category, name='product', slug='prod', price=1255, stock=120, discount=discount)
+    CartItem.objects.create(user=user, product=product, quantity=2)
+
+    data = OrderDTO.from_cart(CartItem.objects.filter(user=user).select_related('product'))
+    assert data.total == 2 * 1129
+
+
+@pytest.mark.django_db
+def test_order_conditional_get_follows_order_and_payment_changes(user):
+    order = Order.objects.create(owner=user, total=3600)
+    client = APIClient()
+    client.force_authenticate(user)
+    url = reverse('orders-detail', args=[order.pk])
+
+    etag = client.get(url)['ETag']
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+    # right away, well within the second Last-Modified would be rounded to
+    Payment.objects.create(order=order, payment_method_id='pm_card', amount=3600, currency='usd', status=Payment.Status.SUCCESS)
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response['ETag'] != etag
+
+    etag = response['ETag']
+    order.state = Order.Status.PAID
+    order.save()
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+
+@pytest.mark.django_db
+def test_order_conditional_get_follows_its_products(user, product, django_capture_on_commit_callbacks):
+    order = Order.objects.create(owner=user, total=3600)
+    OrderItem.objects.create(order=order, product=product, quantity=3)
+    client = APIClient()
+    client.force_authenticate(user)
+    url = reverse('orders-detail', args=[order.pk])
+
+    etag = client.get(url)['ETag']
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+    product = Product.objects.get(pk=product.pk)
+    product.name = 'Renamed'
+    with django_capture_on_commit_callbacks(execute=True):
+        product.save()
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response.data['items'][0]['product']['name'] == 'Renamed'
@@ -1,7 +1,8 @@
 from typing import Any
 from django.shortcuts import render
 from django.db import transaction
-from django.db.models import Prefetch
+from django.db.models import Prefetch, Max
+from django.db.models.functions import Greatest
 from django.utils.translation import gettext_lazy as _
 from django.core.exceptions import ValidationError as DjValidationError
 
@@ -9,7 +10,7 @@ from rest_framework import viewsets
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.request import Request
 from rest_framework.response import Response
-from rest_framework.exceptions import ValidationError, MethodNotAllowed
+from rest_framework.exceptions import ValidationError, MethodNotAllowed, NotFound
 from rest_framework.decorators import action
 from rest_framework import status
 
@@ -18,34 +19,53 @@ from payment.services import PaymentService, StripePaymentService, PaymentState
 from payment.exceptions import PaymentFailure
 
 from cart.models import CartItem
+from cart.store import cart_store
 from common.throttles import BurstThrottle, DailyThrottle, RapidThrottle
+from common.streaming import StreamingExportMixin
+from common.conditional import conditional_response
+from common.cache import etag_for, request_cache_key, tag_versions
+from common.serializers import sparse_fieldset, field_requested
 
 from .serializers import OrderSerializer
 from .models import Order, OrderItem
+from product.models import Product
+from product.cache import product_tags
 from .dto import OrderDTO, OrderAssembler
 
-from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.pagination import CursorPagination
 
-class OrderPagination(PageNumberPagination):
+from common.pagination import PageOrCursorPagination
+
+class OrderPagination(PageOrCursorPagination):
     page_size=10
     page_size_query_param = 'page_size'
     max_page_size= 100
-    ordering='-date_added'
+    ordering=('-date_added', '-id')
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(StreamingExportMixin, viewsets.ModelViewSet):
     serializer_class= OrderSerializer
     permission_classes = [IsAuthenticated]
     pagination_class= OrderPagination
+    query_budget = {'list': 6, 'retrieve': 10, 'export': 10}
     
     def __init__(self, payment_service: PaymentService= StripePaymentService() , **kwargs: Any) -> None:
         super().__init__(**kwargs)
         self.payment_service = payment_service
     
     def get_queryset(self):
-        queryset = self.request.user.orders.prefetch_related('payments')
+        queryset = self.request.user.orders.all()
+        if field_requested(self.request, 'payments'):
+            queryset = queryset.prefetch_related('payments')
         if self.action == 'list':
-            return queryset.all()
-        return queryset.prefetch_related(Prefetch('items', queryset=OrderItem.objects.select_related('product')), 'payments')
+            return queryset.order_by('-date_added', '-id').all()
+        if field_requested(self.request, 'items'):
+            items = OrderItem.objects.all()
+            if field_requested(self.request, 'product', 'items'):
+                items = items.prefetch_related(Prefetch(
+                    'product', Product.objects.for_fields(*sparse_fieldset(self.request, 'items.product'))
+                ))
+            queryset = queryset.prefetch_related(Prefetch('items', queryset=items))
+        return queryset
     
     def get_serializer(self, *args, **kwargs):
         serializer_class = self.get_serializer_class()
@@ -57,12 +77,39 @@ class OrderViewSet(viewsets.ModelViewSet):
         kwargs.setdefault('context', self.get_serializer_context())
         return serializer_class(detail=detail,*args, **kwargs)
     
+    def retrieve(self, request, *args, **kwargs):
+        # the order or its latest payment, whichever changed last
+        try:
+            last_modified = self.request.user.orders\
+                .filter(pk=kwargs['pk'])\
+                .annotate(last_modified=Greatest('date_modified', Max('payments__date_modified')))\
+                .values_list('last_modified', flat=True)\
+                .first()
+        except (TypeError, ValueError):
+            last_modified = None
+        if last_modified is None:
+            raise NotFound()
+        # the nested products change on their own, their tags are part of the validator
+        versions = {}
+        if field_requested(request, 'items'):
+            products = Product.objects.filter(orders__order_id=kwargs['pk']).only('pk', 'category_id', 'discount_id')
+            versions = tag_versions(product_tags(products))
+        # full precision, Last-Modified would miss changes within the same second
+        etag = etag_for(request_cache_key(request, 'orders'), last_modified.isoformat(), sorted(versions.items()))
+        return conditional_response(
+            request, lambda: super(OrderViewSet, self).retrieve(request, *args, **kwargs), etag=etag
+        )
+
     def get_throttles(self):
         if self.request.method in ('create',):
             return [BurstThrottle(), RapidThrottle(), DailyThrottle()]
         return super().get_throttles()
     
     def create(self, request: Request, *args, **kwargs) -> Response:
+        store = cart_store()
+        if store is not None:
+            # check out what the user sees, not the last write-behind
+            store.flush_and_discard(request.user.pk)
         with transaction.atomic():
             user = request.user
             payment_serializer = PaymentMethodInputSerializer(data=request.data)
@@ -91,6 +138,9 @@ class OrderViewSet(viewsets.ModelViewSet):
             
             
         user.clear_cart()
+        if store is not None:
+            # a write landing meanwhile loaded the cart again, keep it without what was bought
+            store.drop_lines(user.pk, [item.product_id for item in cart_items])
         
         order_serializer = OrderSerializer(instance=order, context={'request': request})
         
@@ -12,5 +12,8 @@ class ProductAdmin(admin.ModelAdmin):
 
 admin.site.register(Category)
 admin.site.register(ProductImage)
-admin.site.register(Discount)
+
+@admin.register(Discount)
+class DiscountAdmin(admin.ModelAdmin):
+    list_display = ['name', 'percent', 'active', 'starts_at', 'ends_at']
 
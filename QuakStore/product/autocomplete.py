@@ -0,0 +1,63 @@
+from django.conf import settings
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db.models import Case, When, Value, IntegerField, QuerySet
+
+from common.lru import LRUCache
+
+from .models import Product, Category
+
+
+AUTOCOMPLETE_LIMIT = 8
+# shorter terms have no trigram to look up in the index
+MIN_TERM_LENGTH = 3
+MAX_TERM_LENGTH = 64
+
+# popular prefixes, per process
+suggestions_cache = LRUCache(
+    maxsize=getattr(settings, 'AUTOCOMPLETE_CACHE_SIZE', 4096),
+    ttl=getattr(settings, 'AUTOCOMPLETE_CACHE_TIMEOUT', 60),
+)
+
+
+def normalize_term(term: str) -> str:
+    return ' '.join(term.lower().split())[:MAX_TERM_LENGTH]
+
+
+def _matches(queryset: QuerySet, term: str, image_field: str) -> list[dict]:
+    """
+    Names containing the term, served by the trigram index, prefix matches
+    first then by similarity.
+    """
+    rows = queryset\
+        .filter(name__icontains=term)\
+        .annotate(
+            is_prefix=Case(When(name__istartswith=term, then=Value(0)), default=Value(1), output_field=IntegerField()),
+            similarity=TrigramSimilarity('name', term),
+        )\
+        .order_by('is_prefix', '-similarity', 'name', 'id')\
+        .values('id', 'name', 'slug', image_field)[:AUTOCOMPLETE_LIMIT]
+
+    storage = queryset.model._meta.get_field(image_field).storage
+    return [
+        {
+            'id': row['id'],
+            'name': row['name'],
+            'slug': row['slug'],
+            'thumbnail': storage.url(row[image_field]) if row[image_field] else None,
+        }
+        for row in rows
+    ]
+
+
+def suggest(term: str) -> dict:
+    """
+    Products and categories whose name matches `term`, cached per
+    normalized term.
+    """
+    term = normalize_term(term)
+    if len(term) < MIN_TERM_LENGTH:
+        return {'products': [], 'categories': []}
+    return suggestions_cache.get_or_set(term, lambda: {
+        'products': _matches(Product.objects.all(), term, 'thumbnail'),
+        'categories': _matches(Category.objects.all(), term, 'icon'),
+    })
@@ -0,0 +1,45 @@
+from collections.abc import Iterable
+
+from common.cache import invalidate_tags
+
+from .models import Product, Category
+
+
+# which products a filtered, searched or ordered listing page holds
+PRODUCTS_LIST_TAG = 'products:list'
+# bumped on every product save, only the listings ordered by it carry it
+PRODUCTS_MODIFIED_TAG = 'products:list:date_modified'
+CATEGORIES_LIST_TAG = 'categories:list'
+# product counts, stock and prices of the category index
+CATEGORY_INDEX_TAG = 'categories:index'
+# product counts by category, price, stock and rating of the listing facets
+FACETS_TAG = 'products:facets'
+
+
+def product_tags(products: Iterable[Product]) -> set[str]:
+    tags = set()
+    for product in products:
+        tags.add(f"product:{product.pk}")
+        tags.add(f"category:{product.category_id}")
+        if product.discount_id:
+            tags.add(f"discount:{product.discount_id}")
+    return tags
+
+
+def list_tags(ordering: Iterable[str]) -> set[str]:
+    """The tags of a listing page, given its ordering terms."""
+    tags = {PRODUCTS_LIST_TAG}
+    if any(term.lstrip('-') == 'date_modified' for term in ordering):
+        tags.add(PRODUCTS_MODIFIED_TAG)
+    return tags
+
+
+def category_tags(categories: Iterable[Category]) -> set[str]:
+    return {f"category:{category.pk}" for category in categories}
+
+
+def invalidate_products(product_ids: Iterable[int]) -> None:
+    # stock, prices and sales changed, the listings filter and order on them
+    invalidate_tags(
+        PRODUCTS_LIST_TAG, CATEGORY_INDEX_TAG, FACETS_TAG, *(f"product:{pk}" for pk in product_ids)
+    )
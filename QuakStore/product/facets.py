@@ -0,0 +1,68 @@
+from django.db.models import Count, Q, QuerySet
+
+from .models import Product
+
+
+# lower bounds of the discounted price in cents, the last bucket is open ended
+PRICE_BUCKETS = (0, 1000, 2500, 5000, 10000, 25000, 50000)
+# "n stars and up"
+RATING_BUCKETS = (4, 3, 2, 1)
+
+
+def price_ranges() -> list[tuple[int, int | None]]:
+    return list(zip(PRICE_BUCKETS, PRICE_BUCKETS[1:] + (None,)))
+
+
+def product_facets(queryset: QuerySet[Product]) -> dict:
+    """
+    Product counts of a filtered listing per category, price bucket, stock
+    and rating. A single GROUP BY category query counts every other facet
+    with filtered aggregates, the per category rows are then summed up.
+    """
+    aggregates = {
+        'count': Count('pk'),
+        'in_stock': Count('pk', filter=Q(stock__gt=0)),
+    }
+    for index, (low, high) in enumerate(price_ranges()):
+        price = Q(effective_price__gte=low) if high is None else Q(effective_price__gte=low, effective_price__lt=high)
+        aggregates[f"price_{index}"] = Count('pk', filter=price)
+    for stars in RATING_BUCKETS:
+        aggregates[f"rating_{stars}"] = Count('pk', filter=Q(stats__avg_rating__gte=stars))
+
+    rows = list(
+        queryset
+        .order_by()
+        .values('category_id', 'category__name', 'category__slug')
+        .annotate(**aggregates)
+        .order_by('category__name', 'category_id')
+    )
+
+    def total(name):
+        return sum(row[name] for row in rows)
+
+    count = total('count')
+    in_stock = total('in_stock')
+    return {
+        'count': count,
+        'categories': [
+            {
+                'id': row['category_id'],
+                'name': row['category__name'],
+                'slug': row['category__slug'],
+                'count': row['count'],
+            }
+            for row in rows
+        ],
+        'price': [
+            {'min': low, 'max': high, 'count': total(f"price_{index}")}
+            for index, (low, high) in enumerate(price_ranges())
+        ],
+        'stock': {
+            'in_stock': in_stock,
+            'out_of_stock': count - in_stock,
+        },
+        'rating': [
+            {'min': stars, 'count': total(f"rating_{stars}")}
+            for stars in RATING_BUCKETS
+        ],
+    }
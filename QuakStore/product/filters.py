@@ -0,0 +1,42 @@
+from django.db.models import F
+from django.contrib.postgres.search import SearchQuery, SearchRank
+
+from rest_framework import filters
+
+import django_filters
+
+from .models import Product
+
+
+class ProductFilter(django_filters.FilterSet):
+    """
+    Exact category and stock matches, and `__gte`/`__lte` ranges on the
+    stock and on the list and discounted prices.
+    """
+    class Meta:
+        model = Product
+        fields = {
+            'category': ['exact'],
+            'stock': ['exact', 'gte', 'lte'],
+            'price': ['gte', 'lte'],
+            'effective_price': ['gte', 'lte'],
+        }
+
+
+class RankedSearchFilter(filters.SearchFilter):
+    """
+    Full text search against the stored `Product.search_vector`, so the GIN
+    index is used, with the results ordered by rank.
+    """
+    vector_field = 'search_vector'
+
+    def filter_queryset(self, request, queryset, view):
+        terms = request.query_params.get(self.search_param, '').strip()
+        if not terms:
+            return queryset
+
+        query = SearchQuery(terms, search_type='websearch')
+        return queryset\
+            .filter(**{self.vector_field: query})\
+            .annotate(search_rank=SearchRank(F(self.vector_field), query))\
+            .order_by('-search_rank', '-date_added', '-id')
@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework import serializers
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from product.models import Product
+from product.serializers import ProductSerializer
+
+
+class Command(BaseCommand):
+    help = "Compare the rows per second of ProductSerializer against the product card list serializer"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100, help="Products serialized per run")
+        parser.add_argument('--runs', type=int, default=20)
+
+    def handle(self, *args, **options):
+        request = Request(APIRequestFactory().get('/api/v1/products/'))
+        context = {'request': request}
+        products = list(
+            Product.objects
+            .select_related('discount', 'category')
+            .prefetch_related('images')
+            .with_rating()
+            .with_sales()[:options['rows']]
+        )
+        if not products:
+            self.stderr.write("No products to serialize")
+            return
+
+        def per_row():
+            # the plain ListSerializer runs every row through ProductSerializer
+            return serializers.ListSerializer(products, child=ProductSerializer(), context=context).data
+
+        def card_list():
+            return ProductSerializer(products, many=True, context=context).data
+
+        if per_row() != card_list():
+            self.stderr.write(self.style.WARNING("The serializers produced different output"))
+
+        for name, serializer in (('ProductSerializer', per_row), ('ProductCardListSerializer', card_list)):
+            rows_per_second = self.measure(serializer, len(products), options['runs'])
+            self.stdout.write(f"{name:<28} {rows_per_second:>12,.0f} rows/s")
+
+    def measure(self, serializer, rows, runs) -> float:
+        start = time.perf_counter()
+        for _ in range(runs):
+            serializer()
+        return rows * runs / (time.perf_counter() - start)
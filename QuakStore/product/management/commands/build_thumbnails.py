@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from product.models import Product
+from product.renditions import build_thumbnail
+
+
+class Command(BaseCommand):
+    help = "Render the thumbnails of products that have images but no thumbnail yet"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Re-render every thumbnail")
+
+    def handle(self, *args, **options):
+        products = Product.objects.filter(images__isnull=False).distinct()
+        if not options['all']:
+            products = products.filter(Q(thumbnail='') | Q(thumbnail__isnull=True))
+
+        count = 0
+        for product_id in products.values_list('pk', flat=True).iterator():
+            if build_thumbnail(product_id):
+                count += 1
+        self.stdout.write(self.style.SUCCESS(f"Rendered {count} thumbnails"))
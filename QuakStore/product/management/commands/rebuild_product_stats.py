@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from product.models import ProductStats
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized product stats from the reviews and orders tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument('product_ids', nargs='*', type=int, help="Only rebuild these products")
+
+    def handle(self, *args, **options):
+        product_ids = options['product_ids'] or None
+        count = ProductStats.rebuild(product_ids)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt stats for {count} products"))
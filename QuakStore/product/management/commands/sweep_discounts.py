@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from product.services import sweep_discounts
+
+
+class Command(BaseCommand):
+    help = "Start and end the scheduled discounts and reprice their products, meant to run every few minutes"
+
+    def handle(self, *args, **options):
+        started, ended, refused = sweep_discounts()
+        for pk in refused:
+            self.stderr.write(self.style.WARNING(f"Discount {pk} not started, it takes products below the minimum price"))
+        self.stdout.write(self.style.SUCCESS(f"Started {len(started)} and ended {len(ended)} discounts"))
@@ -0,0 +1,51 @@
+# Generated by Django 5.1.2 on 2026-10-18 10:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Avg, Count, Sum, Subquery, OuterRef, DecimalField
+from django.db.models.functions import Cast, Coalesce
+
+
+def populate_product_stats(apps, schema_editor):
+    Product = apps.get_model('product', 'Product')
+    ProductStats = apps.get_model('product', 'ProductStats')
+    Review = apps.get_model('reviews', 'Review')
+
+    ProductStats.objects.bulk_create(
+        [ProductStats(product_id=pk) for pk in Product.objects.values_list('pk', flat=True)],
+        batch_size=1000,
+        ignore_conflicts=True
+    )
+    reviews = Review.objects.filter(product_id=OuterRef('product_id')).order_by().values('product_id')
+    ProductStats.objects.update(
+        rating_count=Coalesce(Subquery(reviews.annotate(count=Count('pk')).values('count')), 0),
+        rating_sum=Coalesce(Subquery(reviews.annotate(total=Sum('rating')).values('total')), 0),
+        avg_rating=Subquery(reviews.annotate(
+            avg=Cast(Avg('rating'), DecimalField(max_digits=5, decimal_places=2))
+        ).values('avg'))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0003_category_icon'),
+        ('reviews', '0002_alter_review_options_review_date_added_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductStats',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='product.product')),
+                ('rating_count', models.PositiveIntegerField(default=0)),
+                ('rating_sum', models.PositiveBigIntegerField(default=0)),
+                ('avg_rating', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('date_modified', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Product stats',
+            },
+        ),
+        migrations.RunPython(populate_product_stats, migrations.RunPython.noop),
+    ]
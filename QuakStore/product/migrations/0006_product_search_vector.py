@@ -0,0 +1,39 @@
+# Generated by Django 5.1.2 on 2026-10-18 11:00
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import Subquery, OuterRef
+
+
+def populate_search_vector(apps, schema_editor):
+    Product = apps.get_model('product', 'Product')
+    Category = apps.get_model('product', 'Category')
+
+    category_name = Subquery(Category.objects.filter(pk=OuterRef('category_id')).values('name')[:1])
+    Product.objects.update(search_vector=(
+        SearchVector('name', weight='A')
+        + SearchVector(category_name, weight='B')
+        + SearchVector('description', weight='C')
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0005_product_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='product_search_vector_idx'),
+        ),
+        migrations.RunPython(populate_search_vector, migrations.RunPython.noop),
+    ]
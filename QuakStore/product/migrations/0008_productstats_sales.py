@@ -0,0 +1,51 @@
+# Generated by Django 5.1.2 on 2026-10-18 13:00
+
+from django.db import migrations, models
+from django.db.models import Count, Sum, Subquery, OuterRef
+from django.db.models.functions import Coalesce
+
+
+SOLD_STATES = ['paid', 'processing', 'shipping', 'completed', 'partial_refund']
+
+
+def populate_sales(apps, schema_editor):
+    ProductStats = apps.get_model('product', 'ProductStats')
+    OrderItem = apps.get_model('orders', 'OrderItem')
+
+    sales = OrderItem.objects\
+        .filter(product_id=OuterRef('product_id'), order__state__in=SOLD_STATES)\
+        .order_by().values('product_id')
+    ProductStats.objects.update(
+        order_count=Coalesce(Subquery(sales.annotate(count=Count('order_id', distinct=True)).values('count')), 0),
+        units_sold=Coalesce(Subquery(sales.annotate(total=Sum('quantity')).values('total')), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0007_renditions'),
+        ('orders', '0003_order_owner_date_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productstats',
+            name='order_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='productstats',
+            name='units_sold',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='productstats',
+            index=models.Index(fields=['order_count', 'product'], name='stats_order_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productstats',
+            index=models.Index(fields=['units_sold', 'product'], name='stats_units_sold_idx'),
+        ),
+        migrations.RunPython(populate_sales, migrations.RunPython.noop),
+    ]
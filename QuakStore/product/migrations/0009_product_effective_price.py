@@ -0,0 +1,40 @@
+# Generated by Django 5.1.2 on 2026-10-18 15:00
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, DecimalField
+from django.db.models.functions import Cast, Coalesce, Floor
+
+
+def populate_effective_price(apps, schema_editor):
+    Product = apps.get_model('product', 'Product')
+    Discount = apps.get_model('product', 'Discount')
+
+    percent = Subquery(
+        Discount.objects.filter(pk=OuterRef('discount_id'), active=True).values('percent')[:1]
+    )
+    discounted = Cast(
+        Floor(F('price') * (100 - percent) / 100, output_field=DecimalField(max_digits=20, decimal_places=2)),
+        models.PositiveBigIntegerField()
+    )
+    Product.objects.update(effective_price=Coalesce(discounted, F('price')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0008_productstats_sales'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='effective_price',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+            preserve_default=False,
+        ),
+        migrations.RunPython(populate_effective_price, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['effective_price', 'id'], name='product_effective_price_id_idx'),
+        ),
+    ]
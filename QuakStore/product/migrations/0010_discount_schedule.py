@@ -0,0 +1,23 @@
+# Generated by Django 5.1.2 on 2026-10-18 15:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0009_product_effective_price'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='discount',
+            name='starts_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='discount',
+            name='ends_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.2 on 2026-10-18 22:00
+
+from django.db import migrations
+
+
+# Every product gets its stats row from the database itself, so rows
+# inserted around Product.save (bulk_create, raw loaddata, plain SQL) still
+# show up in the listings inner joining the stats.
+CREATE_TRIGGER = """
+CREATE FUNCTION product_create_stats() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO product_productstats
+        (product_id, rating_count, rating_sum, avg_rating, order_count, units_sold, date_modified)
+    VALUES (NEW.id, 0, 0, NULL, 0, 0, now())
+    ON CONFLICT (product_id) DO NOTHING;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER product_create_stats
+    AFTER INSERT ON product_product
+    FOR EACH ROW EXECUTE FUNCTION product_create_stats();
+
+INSERT INTO product_productstats
+    (product_id, rating_count, rating_sum, avg_rating, order_count, units_sold, date_modified)
+SELECT id, 0, 0, NULL, 0, 0, now() FROM product_product
+ON CONFLICT (product_id) DO NOTHING;
+"""
+
+DROP_TRIGGER = """
+DROP TRIGGER product_create_stats ON product_product;
+DROP FUNCTION product_create_stats();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0011_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_TRIGGER, DROP_TRIGGER),
+    ]
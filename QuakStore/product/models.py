@@ -1,9 +1,9 @@
-from io import BytesIO
-from PIL import Image
-
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.db.models import F, Avg, Count, Sum, Subquery, OuterRef, DecimalField, FloatField, Case, When, Value
+from django.db.models.functions import Cast, Coalesce, NullIf, Now, Floor, Upper
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.core.files import File
 from django.conf import settings
 from django.urls import reverse
 from django.core.exceptions import ValidationError
@@ -20,35 +20,179 @@ class Category(models.Model):
         FileExtensionValidator(['png', 'svg', 'ico']),
         LimitedFileSizeValidator(100 * 1024)
         ])
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
 
     class Meta:
         ordering = ('name',)
+        indexes = [
+            # name__icontains compiles to UPPER(name) LIKE UPPER(term)
+            GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'), name='category_name_trgm_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remembered so the cached slug resolutions and the search vectors
+        # of the products are only updated on change
+        instance._loaded_slug = instance.__dict__.get('slug')
+        instance._loaded_name = instance.__dict__.get('name')
+        return instance
+
     def get_absolute_url(self):
         return reverse("category-detail", kwargs={"category_slug": self.slug})
 
 
+# lowest price a product can be sold at, discounted or not
+MINIMUM_PRICE = 50
+
+
+def discounted(price, percent):
+    """SQL expression of `price` minus `percent`, truncated like `Product.discounted_price`."""
+    return Cast(
+        Floor(price * (100 - percent) / 100, output_field=DecimalField(max_digits=20, decimal_places=2)),
+        models.PositiveBigIntegerField()
+    )
+
+
 class Discount(models.Model):
     name = models.CharField(max_length=50)
 
     percent = models.DecimalField(max_digits=5, decimal_places=2, default=0.00, validators=[
                                   MaxValueValidator(Decimal(98.0))])
     active = models.BooleanField(default=True)
+    # the sweep_discounts command switches `active` on and off within this window
+    starts_at = models.DateTimeField(null=True, blank=True)
+    ends_at = models.DateTimeField(null=True, blank=True)
 
     date_added = models.DateTimeField(auto_now_add=True)
     date_modified = models.DateTimeField(auto_now=True)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remembered to only reprice the products when the discount really changed
+        instance._loaded_pricing = (instance.__dict__.get('percent'), instance.__dict__.get('active'))
+        return instance
+
     @property
     def decimal(self):
         return self.percent / Decimal(100)
 
+    def clean(self) -> None:
+        super().clean()
+        if self.starts_at and self.ends_at and self.starts_at >= self.ends_at:
+            raise ValidationError({'ends_at': _("The discount must end after it starts")})
+        if self.pk is None or self.percent is None:
+            return
+        below = Product.objects.filter(discount=self).below_minimum_price(self.percent)
+        names = list(below.values_list('name', flat=True)[:5])
+        if names:
+            raise ValidationError({'percent': _("The discount takes the price of %(products)s below the minimum") % {
+                'products': ', '.join(names)
+            }})
+
+    def is_scheduled_now(self, now) -> bool:
+        return (self.starts_at is None or self.starts_at <= now) and (self.ends_at is None or now < self.ends_at)
+
     def __str__(self):
         return self.name
 
 
+class ProductQuerySet(models.QuerySet):
+    # Every product has its stats row, inserted with it by a database
+    # trigger (see migration 0012), so the stats are inner joined and their columns used as is:
+    # ordering by them can then walk the stats indexes instead of sorting.
+    def with_rating(self):
+        return self.filter(stats__isnull=False).annotate(
+            avg_rating=F('stats__avg_rating'),
+            rating_count=F('stats__rating_count')
+        )
+
+    def with_sales(self):
+        return self.filter(stats__isnull=False).annotate(
+            order_count=F('stats__order_count'),
+            units_sold=F('stats__units_sold')
+        )
+
+    # product columns read by each serialized field, see ProductSerializer
+    serialized_columns = {
+        'name': ('name',),
+        'thumbnail_url': ('thumbnail',),
+        'absolute_url': ('slug', 'category'),
+        'description': ('description',),
+        'discount': ('discount',),
+        'price': ('price',),
+        'effective_price': ('effective_price',),
+        'stock': ('stock',),
+        'in_stock': ('stock',),
+        'category': ('category',),
+    }
+
+    def for_fields(self, included: set[str] | None = None, excluded: set[str] = frozenset(), ordering=()):
+        """
+        Only join, prefetch, annotate and select what serializing the
+        `included` (all when `None`) minus `excluded` fields and ordering
+        by `ordering` needs.
+        """
+        def wanted(*names):
+            return any(name not in excluded and (included is None or name in included) for name in names)
+
+        ordered_by = {term.lstrip('-') for term in ordering}
+        queryset = self
+
+        related = [name for name in ('discount', 'category') if wanted(name)]
+        if wanted('absolute_url') and 'category' not in related:
+            related.append('category')
+        if related:
+            queryset = queryset.select_related(*related)
+        if wanted('thumbnail_url', 'thumbnail_srcset', 'images'):
+            queryset = queryset.prefetch_related('images')
+        if wanted('avg_rating', 'rating_count') or 'rating_count' in ordered_by:
+            queryset = queryset.with_rating()
+        if ordered_by & {'order_count', 'units_sold'}:
+            queryset = queryset.with_sales()
+
+        if included is not None:
+            concrete = {field.name for field in self.model._meta.concrete_fields}
+            columns = {'id', 'date_added'} | (ordered_by & concrete) | set(related)
+            for name in included - excluded:
+                columns.update(self.serialized_columns.get(name, ()))
+            queryset = queryset.only(*columns)
+        return queryset
+
+    def update_effective_price(self) -> int:
+        """
+        Recompute the stored `effective_price` of the products in a single
+        UPDATE, the same way as `Product.discounted_price`.
+        """
+        percent = Subquery(
+            Discount.objects.filter(pk=OuterRef('discount_id'), active=True).values('percent')[:1]
+        )
+        return self.update(effective_price=Coalesce(discounted(F('price'), percent), F('price')))
+
+    def below_minimum_price(self, percent: Decimal | None = None):
+        """
+        The products a `percent` discount, their own discount's when not
+        given, would take below `MINIMUM_PRICE`, active or not.
+        """
+        percent = F('discount__percent') if percent is None else Value(Decimal(percent))
+        return self.alias(price_after_discount=discounted(F('price'), percent))\
+            .filter(price_after_discount__lt=MINIMUM_PRICE)
+
+    def update_search_vector(self) -> int:
+        category_name = Subquery(
+            Category.objects.filter(pk=OuterRef('category_id')).values('name')[:1]
+        )
+        return self.update(search_vector=(
+            SearchVector('name', weight='A')
+            + SearchVector(category_name, weight='B')
+            + SearchVector('description', weight='C')
+        ))
+
+
 class Product(models.Model):
     category = models.ForeignKey(
         Category, related_name='products', on_delete=models.CASCADE)
@@ -58,17 +202,55 @@ class Product(models.Model):
     stripe_id = models.CharField(
         max_length=255, unique=True, blank=True, null=True)
     price = models.PositiveBigIntegerField(
-        validators=[MinValueValidator(50), MaxValueValidator(1000000)])
+        validators=[MinValueValidator(MINIMUM_PRICE), MaxValueValidator(1000000)])
     stock = models.PositiveIntegerField(validators=[MaxValueValidator(10000)])
     discount = models.ForeignKey(
         Discount, on_delete=models.SET_NULL, null=True, blank=True)
+    # the discounted price, kept in sync so it can be filtered and sorted on
+    effective_price = models.PositiveBigIntegerField(editable=False)
     thumbnail = models.ImageField(
         upload_to='uploads/thumbnails/', blank=True, null=True)
     date_added = models.DateTimeField(auto_now_add=True)
     date_modified = models.DateTimeField(auto_now=True)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = ProductQuerySet.as_manager()
 
     class Meta:
         ordering = ('-date_added',)
+        indexes = [
+            models.Index(fields=['-date_added', '-id'], name='product_date_added_id_idx'),
+            models.Index(fields=['-date_modified', '-id'], name='product_date_modified_id_idx'),
+            models.Index(fields=['price', 'id'], name='product_price_id_idx'),
+            models.Index(fields=['effective_price', 'id'], name='product_effective_price_id_idx'),
+            models.Index(fields=['stock', 'id'], name='product_stock_id_idx'),
+            GinIndex(fields=['search_vector'], name='product_search_vector_idx'),
+            GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'), name='product_name_trgm_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remembered so the cached slug resolutions can be dropped, and the
+        # search vector and the cached listings updated, on change
+        instance._loaded_route = (instance.__dict__.get('category_id'), instance.__dict__.get('slug'))
+        instance._loaded_search = instance.search_values()
+        instance._loaded_listing = instance.listing_values()
+        return instance
+
+    def search_values(self) -> tuple:
+        """The loaded values of the columns the search vector is built from."""
+        return tuple(self.__dict__.get(name) for name in ('name', 'description', 'category_id'))
+
+    def listing_values(self) -> tuple:
+        """
+        The loaded values of the columns the listings filter, search and
+        order on, but for `date_modified` which changes on every save.
+        """
+        return tuple(
+            self.__dict__.get(name)
+            for name in ('category_id', 'name', 'description', 'price', 'effective_price', 'stock')
+        )
 
     @property
     def in_stock(self) -> bool:
@@ -80,42 +262,32 @@ class Product(models.Model):
             return int(self.price * (1 - self.discount.decimal))
         return self.price
 
+    def save(self, *args, **kwargs):
+        self.effective_price = self.discounted_price
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'price', 'discount', 'discount_id'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'effective_price'}
+        super().save(*args, **kwargs)
+
     def clean(self) -> None:
         super().clean()
-        if (self.price is None) or (self.discounted_price < 50):
+        if (self.price is None) or (self.discounted_price < MINIMUM_PRICE):
             raise ValidationError({'discount': _("The discount resulted in a price thats below the minimum")})
 
     def get_absolute_url(self):
         return reverse("product-detail", kwargs={"category_slug": self.category.slug, "product_slug": self.slug})
 
     def thumbnail_url(self) -> str | None:
+        """
+        The rendered thumbnail, or the original first image until the
+        background rendition is ready. Never writes, as it's called on reads.
+        """
         if self.thumbnail:
             return self.thumbnail.url
-        else:
-            if not len(self.images.all()):
-                return None
-            image = self.images.all()[0]
-            if image:
-                self.thumbnail = self.make_thumbnail(image.url)
-                self.save()
-
-                return self.thumbnail.url
-            else:
-                return None
-
-    
-    def make_thumbnail(self, image, size=(300, 200)):
-        img = Image.open(image)
-        img = img.convert('RGB')
-        img.thumbnail(size)
-
-        thumb_io = BytesIO()
-
-        img.save(thumb_io, 'JPEG', quality=85)
-        thumbnail = File(thumb_io, name=image.name)
-
-        return thumbnail
-    
+        images = self.images.all()
+        if not len(images) or not images[0].url:
+            return None
+        return images[0].url.url
     
     def __str__(self):
        return self.name
@@ -125,3 +297,105 @@ class ProductImage(models.Model):
     url = models.ImageField(upload_to='uploads/', blank=True, null=True)
     product = models.ForeignKey(
         to=Product, related_name='images', on_delete=models.CASCADE)
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
+
+
+class ProductStats(models.Model):
+    """
+    Denormalized per product aggregates, kept up to date by the reviews
+    signals so listings don't have to GROUP BY over the reviews table.
+    """
+    product = models.OneToOneField(
+        Product, related_name='stats', on_delete=models.CASCADE, primary_key=True)
+
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveBigIntegerField(default=0)
+    avg_rating = models.DecimalField(
+        max_digits=5, decimal_places=2, null=True, blank=True)
+
+    # paid orders only, see Order.sold_states
+    order_count = models.PositiveIntegerField(default=0)
+    units_sold = models.PositiveBigIntegerField(default=0)
+
+    date_modified = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'Product stats'
+        indexes = [
+            models.Index(fields=['rating_count', 'product'], name='stats_rating_count_idx'),
+            models.Index(fields=['order_count', 'product'], name='stats_order_count_idx'),
+            models.Index(fields=['units_sold', 'product'], name='stats_units_sold_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} ({self.avg_rating}/5 from {self.rating_count})"
+
+    @classmethod
+    def apply_rating(cls, product_id: int, count: int, total: int) -> int:
+        """
+        Shift the rating aggregates of a product by `count` reviews and
+        `total` rating points in a single UPDATE, returns the updated row count.
+        """
+        rating_count = F('rating_count') + count
+        rating_sum = F('rating_sum') + total
+        return cls.objects.filter(product_id=product_id).update(
+            rating_count=rating_count,
+            rating_sum=rating_sum,
+            avg_rating=Cast(
+                Cast(rating_sum, FloatField()) / NullIf(rating_count, 0),
+                DecimalField(max_digits=5, decimal_places=2)
+            ),
+            date_modified=Now()
+        )
+
+    @classmethod
+    def apply_sales(cls, quantities: dict[int, int], sign: int = 1) -> int:
+        """
+        Count (or with `sign=-1` uncount) one order selling `quantities`
+        (product id -> units) in a single UPDATE.
+        """
+        if not quantities:
+            return 0
+        units = Case(
+            *(When(product_id=product_id, then=Value(sign * quantity)) for product_id, quantity in quantities.items()),
+            default=Value(0)
+        )
+        return cls.objects.filter(product_id__in=quantities.keys()).update(
+            order_count=F('order_count') + sign,
+            units_sold=F('units_sold') + units,
+            date_modified=Now()
+        )
+
+    @classmethod
+    def rebuild(cls, product_ids=None) -> int:
+        """
+        Recompute the aggregates from the reviews and orders tables, for all
+        products or only the given ones, creating any missing stats rows.
+        """
+        from reviews.models import Review
+        from orders.models import Order, OrderItem
+
+        products = Product.objects.all()
+        if product_ids is not None:
+            products = products.filter(pk__in=product_ids)
+
+        cls.objects.bulk_create(
+            [cls(product_id=pk) for pk in products.values_list('pk', flat=True)],
+            batch_size=1000,
+            ignore_conflicts=True
+        )
+
+        reviews = Review.objects.filter(product_id=OuterRef('product_id')).order_by().values('product_id')
+        sales = OrderItem.objects\
+            .filter(product_id=OuterRef('product_id'), order__state__in=Order.sold_states)\
+            .order_by().values('product_id')
+        return cls.objects.filter(product_id__in=products.values('pk')).update(
+            order_count=Coalesce(Subquery(sales.annotate(count=Count('order_id', distinct=True)).values('count')), 0),
+            units_sold=Coalesce(Subquery(sales.annotate(total=Sum('quantity')).values('total')), 0),
+            rating_count=Coalesce(Subquery(reviews.annotate(count=Count('pk')).values('count')), 0),
+            rating_sum=Coalesce(Subquery(reviews.annotate(total=Sum('rating')).values('total')), 0),
+            avg_rating=Subquery(reviews.annotate(
+                avg=Cast(Avg('rating'), DecimalField(max_digits=5, decimal_places=2))
+            ).values('avg')),
+            date_modified=Now()
+        )
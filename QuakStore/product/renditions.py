@@ -0,0 +1,48 @@
+from os.path import basename, splitext
+
+from django.core.files.base import ContentFile
+
+from common.cache import invalidate_tags
+from common.renditions import encode, build_renditions
+
+from .models import Product, ProductImage, Category
+
+
+THUMBNAIL_SIZE = (300, 200)
+
+
+def build_thumbnail(product_id: int) -> str | None:
+    """
+    Render the thumbnail of a product from its first image and store it,
+    returns the stored file name.
+    """
+    product = Product.objects.filter(pk=product_id).first()
+    if product is None:
+        return None
+    image = product.images.order_by('pk').first()
+    if image is None or not image.url:
+        return None
+
+    with image.url.open('rb') as source:
+        data = encode(source.read(), THUMBNAIL_SIZE)
+
+    name = splitext(basename(image.url.name))[0] + '.jpg'
+    product.thumbnail.save(name, ContentFile(data), save=False)
+    # update() so the product save signals don't run for a derived file
+    Product.objects.filter(pk=product_id).update(thumbnail=product.thumbnail.name)
+    invalidate_tags(f"product:{product_id}")
+    return product.thumbnail.name
+
+
+def build_image_renditions(image_id: int) -> dict:
+    renditions = build_renditions(ProductImage, image_id, 'url')
+    product_id = ProductImage.objects.filter(pk=image_id).values_list('product_id', flat=True).first()
+    if product_id is not None:
+        invalidate_tags(f"product:{product_id}")
+    return renditions
+
+
+def build_icon_renditions(category_id: int) -> dict:
+    renditions = build_renditions(Category, category_id, 'icon')
+    invalidate_tags(f"category:{category_id}")
+    return renditions
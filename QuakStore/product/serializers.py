@@ -5,11 +5,17 @@ from .models import Product, Category, Discount, ProductImage
 
 from favorites.models import Favorite
 
+from common.renditions import srcset
+from common.serializers import SparseFieldsetMixin, CommaSeparatedListField
+
 from django.contrib.auth.models import AbstractUser
 from django.conf import settings
 from django.db.models import Avg
+from django.db.models.manager import BaseManager
+from django.urls import reverse
+from django.utils.translation import gettext_lazy as _
 
-class DiscountSerializer(serializers.ModelSerializer):
+class DiscountSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Discount
         fields = [
@@ -19,15 +25,97 @@ class DiscountSerializer(serializers.ModelSerializer):
             'decimal',
         ]
         
-class ProductPhotosSerializer(serializers.ModelSerializer):
+class ProductPhotosSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    srcset = serializers.SerializerMethodField()
+
     class Meta:
         model = ProductImage
         fields = [
-            'url'
+            'url',
+            'srcset'
         ]
+
+    def get_srcset(self, obj: ProductImage):
+        return srcset(obj.renditions, self.context.get('request'))
         
-class ProductSerializer(serializers.ModelSerializer):
+class ProductCardListSerializer(serializers.ListSerializer):
+    """
+    Read path for product lists. Produces the same output as serializing
+    every row through `ProductSerializer`, but computes the request
+    constants once, serializes each category and discount once per
+    response and reads the plain attributes directly.
+    """
+    def to_representation(self, data):
+        products = data.all() if isinstance(data, BaseManager) else data
+        child: ProductSerializer = self.child
+        fields = child.fields
+
+        request = self.context['request']
+        origin = f"{request.scheme}://{request.get_host()}"
+        thumbnail_prefix = origin if settings.DEBUG else ''
+        # reversed once with placeholder slugs and formatted per row
+        absolute_url = origin + reverse(
+            "product-detail", kwargs={"category_slug": "category-slug", "product_slug": "product-slug"}
+        ).replace("category-slug", "{0}").replace("product-slug", "{1}")
+
+        categories = {}
+        discounts = {}
+
+        def category(product: Product):
+            if product.category_id not in categories:
+                categories[product.category_id] = fields['category'].to_representation(product.category)
+            return categories[product.category_id]
+
+        def discount(product: Product):
+            if product.discount_id is None:
+                return None
+            if product.discount_id not in discounts:
+                discounts[product.discount_id] = fields['discount'].to_representation(product.discount)
+            return discounts[product.discount_id]
+
+        def thumbnail_url(product: Product):
+            img = product.thumbnail_url()
+            return None if img is None else thumbnail_prefix + img
+
+        getters = {
+            'id': lambda product: product.pk,
+            'name': lambda product: product.name,
+            'thumbnail_url': thumbnail_url,
+            'thumbnail_srcset': child.get_thumbnail_srcset,
+            'absolute_url': lambda product: absolute_url.format(product.category.slug, product.slug),
+            'description': lambda product: product.description,
+            'discount': discount,
+            'price': lambda product: product.price,
+            'effective_price': lambda product: product.effective_price,
+            'stock': lambda product: product.stock,
+            'in_stock': lambda product: product.stock > 0,
+            'is_favorite': child.get_is_favorite,
+            'avg_rating': child.get_avg_rating,
+            'rating_count': child.get_rating_count,
+            'category': category,
+        }
+
+        def fallback(name):
+            field = fields[name]
+            def getter(product):
+                attribute = field.get_attribute(product)
+                return None if attribute is None else field.to_representation(attribute)
+            return getter
+
+        # only the fields left by ?fields= and ?exclude=
+        row = [
+            (field.field_name, getters.get(field.field_name) or fallback(field.field_name))
+            for field in child._readable_fields
+        ]
+        return [
+            {name: getter(product) for name, getter in row}
+            for product in products
+        ]
+
+
+class ProductSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     thumbnail_url = serializers.SerializerMethodField()
+    thumbnail_srcset = serializers.SerializerMethodField()
     absolute_url = serializers.SerializerMethodField()
     discount = DiscountSerializer()
     is_favorite= serializers.SerializerMethodField()
@@ -47,16 +135,19 @@ class ProductSerializer(serializers.ModelSerializer):
             'id',
             'name',
             'thumbnail_url',
+            'thumbnail_srcset',
             'absolute_url',
             'description',
             'discount',
             'price',
+            'effective_price',
             'stock',
             'in_stock',
             'is_favorite',
             'avg_rating',
             'rating_count'
         ]
+        list_serializer_class = ProductCardListSerializer
 
     def get_thumbnail_url(self, obj: Product):
         img = obj.thumbnail_url()
@@ -67,6 +158,13 @@ class ProductSerializer(serializers.ModelSerializer):
             return f"{request.scheme}://{request.get_host()}{img}"
         else:
             return img
+    def get_thumbnail_srcset(self, obj: Product):
+        # the thumbnail is cut from the first image, so are its renditions
+        images = obj.images.all()
+        if not len(images):
+            return None
+        return srcset(images[0].renditions, self.context.get('request'))
+
     def get_absolute_url(self, obj):
         request = self.context['request']
         return f"{request.scheme}://{request.get_host()}" + obj.get_absolute_url()
@@ -82,6 +180,7 @@ class ProductSerializer(serializers.ModelSerializer):
 
 class CategorySerializer(serializers.ModelSerializer):
     absolute_url = serializers.SerializerMethodField()
+    icon_srcset = serializers.SerializerMethodField()
     
     def __init__(self, instance=None, data=empty, detail=True, **kwargs):
         super().__init__(instance, data, **kwargs)
@@ -97,10 +196,56 @@ class CategorySerializer(serializers.ModelSerializer):
             'id',
             'name',
             'icon',
+            'icon_srcset',
             'absolute_url',
             'products'
         )
 
+    def get_icon_srcset(self, obj: Category):
+        return srcset(obj.renditions, self.context.get('request'))
+
     def get_absolute_url(self, obj):
         request = self.context['request']
         return f"{request.scheme}://{request.get_host()}" + obj.get_absolute_url()
+
+
+class CategoryIndexSerializer(CategorySerializer):
+    product_count = serializers.IntegerField(read_only=True)
+    in_stock_count = serializers.IntegerField(read_only=True)
+    min_price = serializers.IntegerField(read_only=True, allow_null=True)
+    max_price = serializers.IntegerField(read_only=True, allow_null=True)
+
+    def __init__(self, instance=None, data=empty, **kwargs):
+        super().__init__(instance, data, detail=False, **kwargs)
+
+    class Meta(CategorySerializer.Meta):
+        fields = CategorySerializer.Meta.fields + (
+            'product_count',
+            'in_stock_count',
+            'min_price',
+            'max_price',
+        )
+
+
+class ProductBatchSerializer(serializers.Serializer):
+    """
+    Products to look up at once, by id and/or by `category-slug/product-slug`
+    pairs.
+    """
+    max_products = 100
+
+    ids = CommaSeparatedListField(child=serializers.IntegerField(min_value=1), required=False)
+    slugs = CommaSeparatedListField(
+        child=serializers.RegexField(r'^[-a-zA-Z0-9_]+/[-a-zA-Z0-9_]+$'), required=False
+    )
+
+    def validate_slugs(self, value):
+        return [tuple(pair.split('/')) for pair in value]
+
+    def validate(self, attrs):
+        count = len(attrs.get('ids', [])) + len(attrs.get('slugs', []))
+        if not count:
+            raise serializers.ValidationError(_("Give the ids or the slugs of the products"))
+        if count > self.max_products:
+            raise serializers.ValidationError(_(f"Cannot look up more than {self.max_products} products at once"))
+        return attrs
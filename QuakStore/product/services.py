@@ -0,0 +1,55 @@
+from collections.abc import Iterable
+from datetime import datetime
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Product, Discount
+from .cache import invalidate_products
+
+
+def reprice_discounts(discount_ids: Iterable[int]) -> list[int]:
+    """
+    Recompute the effective price of every product of the discounts in one
+    UPDATE and purge the cache of those products only. Returns their ids.
+    """
+    discount_ids = list(discount_ids)
+    if not discount_ids:
+        return []
+    product_ids = list(
+        Product.objects.filter(discount_id__in=discount_ids).values_list('pk', flat=True)
+    )
+    if product_ids:
+        Product.objects.filter(pk__in=product_ids).update_effective_price()
+        invalidate_products(product_ids)
+    return product_ids
+
+
+def sweep_discounts(now: datetime | None = None) -> tuple[list[int], list[int], list[int]]:
+    """
+    Switch the scheduled discounts on and off according to their window and
+    reprice their products. Discounts that would take a product below the
+    minimum price are left off. Returns the started, ended and refused
+    discount ids.
+    """
+    now = now or timezone.now()
+    scheduled = Discount.objects.filter(Q(starts_at__isnull=False) | Q(ends_at__isnull=False))
+    in_window = (Q(starts_at__isnull=True) | Q(starts_at__lte=now)) & (Q(ends_at__isnull=True) | Q(ends_at__gt=now))
+
+    with transaction.atomic():
+        starting = set(scheduled.filter(in_window, active=False).values_list('pk', flat=True))
+        ending = list(scheduled.filter(active=True).exclude(in_window).values_list('pk', flat=True))
+
+        refused = set(
+            Product.objects
+            .filter(discount_id__in=starting)
+            .below_minimum_price()
+            .values_list('discount_id', flat=True)
+        )
+        starting = list(starting - refused)
+
+        Discount.objects.filter(pk__in=starting).update(active=True, date_modified=now)
+        Discount.objects.filter(pk__in=ending).update(active=False, date_modified=now)
+        reprice_discounts(starting + ending)
+    return starting, ending, sorted(refused)
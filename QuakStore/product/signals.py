@@ -0,0 +1,165 @@
+from django.dispatch import receiver
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete
+
+from common.cache import invalidate_tags
+from common.renditions import submit, needs_renditions
+
+from .models import Product, Category, ProductImage, Discount
+from .renditions import build_thumbnail, build_image_renditions, build_icon_renditions
+from .services import reprice_discounts
+from .autocomplete import suggestions_cache
+from .slugs import forget_slugs, category_key, product_key
+from .cache import PRODUCTS_LIST_TAG, PRODUCTS_MODIFIED_TAG, CATEGORIES_LIST_TAG, CATEGORY_INDEX_TAG, FACETS_TAG, invalidate_products
+
+
+@receiver(post_save, sender=Product)
+def update_product_search_vector(sender, instance: Product, created: bool, *args, **kwargs):
+    searched = instance.search_values()
+    loaded = getattr(instance, '_loaded_search', None)
+    instance._loaded_search = searched
+    if not created and loaded == searched:
+        return
+    Product.objects.filter(pk=instance.pk).update_search_vector()
+
+
+@receiver(post_save, sender=Discount)
+def reprice_discount_products(sender, instance: Discount, created: bool, *args, **kwargs):
+    pricing = (instance.percent, instance.active)
+    if not created and getattr(instance, '_loaded_pricing', None) != pricing:
+        reprice_discounts([instance.pk])
+    instance._loaded_pricing = pricing
+
+
+@receiver(pre_delete, sender=Discount)
+def remember_discount_products(sender, instance: Discount, *args, **kwargs):
+    instance._product_ids = list(Product.objects.filter(discount=instance).values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Discount)
+def reprice_undiscounted_products(sender, instance: Discount, *args, **kwargs):
+    # the products were detached by SET_NULL, without going through save()
+    product_ids = getattr(instance, '_product_ids', [])
+    if product_ids:
+        Product.objects.filter(pk__in=product_ids).update_effective_price()
+        invalidate_products(product_ids)
+
+
+@receiver(post_save, sender=Category)
+def update_category_products_search_vector(sender, instance: Category, created: bool, *args, **kwargs):
+    loaded = getattr(instance, '_loaded_name', None)
+    instance._loaded_name = instance.name
+    if created or loaded == instance.name:
+        return
+    Product.objects.filter(category=instance).update_search_vector()
+
+
+@receiver(post_save, sender=ProductImage)
+def schedule_product_image_renditions(sender, instance: ProductImage, *args, **kwargs):
+    if not needs_renditions(instance, 'url'):
+        return
+    pk = instance.pk
+    transaction.on_commit(lambda: submit(build_image_renditions, pk))
+
+
+@receiver(post_save, sender=Category)
+def schedule_category_icon_renditions(sender, instance: Category, *args, **kwargs):
+    if not needs_renditions(instance, 'icon'):
+        return
+    pk = instance.pk
+    transaction.on_commit(lambda: submit(build_icon_renditions, pk))
+
+
+@receiver(post_save, sender=ProductImage)
+def schedule_product_thumbnail(sender, instance: ProductImage, *args, **kwargs):
+    first_image = ProductImage.objects\
+        .filter(product_id=instance.product_id)\
+        .order_by('pk')\
+        .values_list('pk', flat=True)\
+        .first()
+    if first_image != instance.pk:
+        return
+    product_id = instance.product_id
+    transaction.on_commit(lambda: submit(build_thumbnail, product_id))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_cache(sender, instance: Product, created: bool = False, *args, **kwargs):
+    tags = [f"product:{instance.pk}", CATEGORY_INDEX_TAG, FACETS_TAG, PRODUCTS_MODIFIED_TAG]
+    listed = instance.listing_values()
+    loaded = getattr(instance, '_loaded_listing', None)
+    instance._loaded_listing = listed
+    if created or kwargs.get('signal') is post_delete or loaded != listed:
+        # pages the product joins, such as a filter it now matches or its
+        # new category, don't carry its tag yet
+        tags.append(PRODUCTS_LIST_TAG)
+    invalidate_tags(*tags)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_cache(sender, instance: Category, created: bool = False, *args, **kwargs):
+    tags = [f"category:{instance.pk}"]
+    if created or kwargs.get('signal') is post_delete:
+        tags.append(CATEGORIES_LIST_TAG)
+    invalidate_tags(*tags)
+
+
+@receiver(post_save, sender=Discount)
+@receiver(post_delete, sender=Discount)
+def invalidate_discount_cache(sender, instance: Discount, *args, **kwargs):
+    invalidate_tags(f"discount:{instance.pk}")
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def invalidate_product_image_cache(sender, instance: ProductImage, *args, **kwargs):
+    invalidate_tags(f"product:{instance.product_id}")
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def clear_suggestions_cache(sender, *args, **kwargs):
+    # this process only, the other ones catch up when their entries expire
+    suggestions_cache.clear()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def forget_product_slugs(sender, instance: Product, created: bool = False, *args, **kwargs):
+    route = (instance.category_id, instance.slug)
+    loaded = getattr(instance, '_loaded_route', None)
+    instance._loaded_route = route
+    if not created and kwargs.get('signal') is not post_delete and loaded == route:
+        return
+    # the old URL stops resolving and a cached miss on the new one goes away
+    routes = {route}
+    if loaded is not None:
+        routes.add(loaded)
+    category_slugs = dict(
+        Category.objects.filter(pk__in={category_id for category_id, _ in routes}).values_list('pk', 'slug')
+    )
+    forget_slugs(
+        product_key(category_slugs[category_id], slug)
+        for category_id, slug in routes
+        if category_id in category_slugs and slug
+    )
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def forget_category_slugs(sender, instance: Category, created: bool = False, *args, **kwargs):
+    loaded = getattr(instance, '_loaded_slug', None)
+    instance._loaded_slug = instance.slug
+    if not created and kwargs.get('signal') is not post_delete and loaded == instance.slug:
+        return
+    slugs = {instance.slug, loaded} - {None}
+    keys = [category_key(slug) for slug in slugs]
+    if not created:
+        # the URLs of its products moved along
+        product_slugs = list(Product.objects.filter(category=instance).values_list('slug', flat=True))
+        keys += [product_key(category_slug, slug) for category_slug in slugs for slug in product_slugs]
+    forget_slugs(keys)
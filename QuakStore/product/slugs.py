@@ -0,0 +1,73 @@
+"""
+Cached `(category_slug, product_slug)` to ids resolution for the slug
+routed views. Unknown slugs are cached too, for a shorter while, so bots
+probing made up URLs don't reach the database either.
+"""
+from collections.abc import Iterable
+
+from django.core.cache import cache
+from django.db import transaction
+from django.http import Http404
+
+from .models import Product, Category
+
+
+SLUG_CACHE_TIMEOUT = 60 * 60 * 24
+MISSING_SLUG_CACHE_TIMEOUT = 60 * 5
+# cached for unknown slugs, `None` can't be told apart from a miss
+MISSING = ()
+
+
+def category_key(category_slug: str) -> str:
+    return f"slug:category:{category_slug}"
+
+
+def product_key(category_slug: str, product_slug: str) -> str:
+    return f"slug:product:{category_slug}/{product_slug}"
+
+
+def resolve_category(category_slug: str) -> int | None:
+    key = category_key(category_slug)
+    resolved = cache.get(key)
+    if resolved is None:
+        category_id = Category.objects.filter(slug=category_slug).values_list('pk', flat=True).first()
+        resolved = MISSING if category_id is None else (category_id,)
+        cache.set(key, resolved, SLUG_CACHE_TIMEOUT if resolved else MISSING_SLUG_CACHE_TIMEOUT)
+    return resolved[0] if resolved else None
+
+
+def resolve_product(category_slug: str, product_slug: str) -> tuple[int, int] | None:
+    """The `(category_id, product_id)` of a product URL, `None` when unknown."""
+    key = product_key(category_slug, product_slug)
+    resolved = cache.get(key)
+    if resolved is None:
+        resolved = Product.objects\
+            .filter(category__slug=category_slug, slug=product_slug)\
+            .values_list('category_id', 'pk')\
+            .first() or MISSING
+        cache.set(key, tuple(resolved), SLUG_CACHE_TIMEOUT if resolved else MISSING_SLUG_CACHE_TIMEOUT)
+    return tuple(resolved) if resolved else None
+
+
+def category_id_or_404(category_slug: str) -> int:
+    category_id = resolve_category(category_slug)
+    if category_id is None:
+        raise Http404()
+    return category_id
+
+
+def product_id_or_404(category_slug: str, product_slug: str) -> int:
+    resolved = resolve_product(category_slug, product_slug)
+    if resolved is None:
+        raise Http404()
+    return resolved[1]
+
+
+def forget_slugs(keys: Iterable[str]) -> None:
+    """
+    Drop resolved or missing entries once the transaction commits, so a
+    concurrent request can't cache the old slugs again.
+    """
+    keys = list(keys)
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
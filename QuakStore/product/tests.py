@@ -0,0 +1,345 @@
+from rest_framework.test import APIClient
+
+import pytest
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+
+from .autocomplete import suggestions_cache
+from .models import Category, Product, ProductStats, Discount, ProductQuerySet
+from .services import sweep_discounts
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    suggestions_cache.clear()
+    yield
+    cache.clear()
+    suggestions_cache.clear()
+
+
+# the shared fixtures, with names the search and autocomplete tests can match
+@pytest.fixture
+def category(db):
+    return Category.objects.create(name="Rubber ducks", slug="rubber-ducks")
+
+
+@pytest.fixture
+def product(make_product):
+    return make_product(name='Yellow duck', slug='yellow-duck', stock=120)
+
+
+@pytest.mark.django_db
+class TestAutocomplete:
+    def suggest(self, term):
+        response = APIClient().get(reverse('autocomplete'), {'q': term})
+        assert response.status_code == 200
+        return response.data
+
+    def test_matches_products_and_categories_case_insensitively(self, product, category):
+        data = self.suggest('DUCK')
+        assert [row['slug'] for row in data['products']] == [product.slug]
+        assert [row['slug'] for row in data['categories']] == [category.slug]
+
+    def test_prefix_matches_come_first(self, product, make_product):
+        other = make_product(name='Duck pond', slug='duck-pond')
+        assert [row['id'] for row in self.suggest('duck')['products']] == [other.pk, product.pk]
+
+    def test_short_terms_suggest_nothing(self, product):
+        assert self.suggest('du') == {'products': [], 'categories': []}
+
+    def test_suggestions_are_cached_per_normalized_term(self, product):
+        self.suggest('yellow  duck')
+        Product.objects.filter(pk=product.pk).update(name='Blue duck')
+        assert [row['name'] for row in self.suggest('Yellow Duck')['products']] == ['Yellow duck']
+
+    def test_name_lookup_uses_the_trigram_index(self, product, category):
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        assert 'product_name_trgm_idx' in Product.objects.filter(name__icontains='duck').explain()
+        assert 'category_name_trgm_idx' in Category.objects.filter(name__icontains='duck').explain()
+
+
+@pytest.mark.django_db
+def test_products_are_ordered_by_units_sold(product, make_product):
+    best_seller = make_product(name='Green duck', slug='green-duck')
+    ProductStats.apply_sales({best_seller.pk: 5})
+
+    response = APIClient().get(reverse('products-list'), {'ordering': '-units_sold'})
+    assert response.status_code == 200
+    assert [row['id'] for row in response.data['results']] == [best_seller.pk, product.pk]
+
+
+@pytest.mark.django_db
+def test_bulk_created_products_get_their_stats(product, category):
+    bulk, = Product.objects.bulk_create([
+        Product(category=category, name='Bulk duck', slug='bulk-duck', price=1200, stock=120)
+    ])
+
+    assert ProductStats.objects.filter(product=bulk).exists()
+    response = APIClient().get(reverse('products-list'))
+    assert {row['id'] for row in response.data['results']} == {product.pk, bulk.pk}
+
+
+@pytest.mark.django_db
+def test_moved_product_shows_up_in_its_new_category(product, category, django_capture_on_commit_callbacks):
+    other = Category.objects.create(name="Bath toys", slug="bath-toys")
+    client = APIClient()
+    url = reverse('category-detail', args=[other.slug])
+    assert client.get(url).data['products']['results'] == []
+
+    product = Product.objects.get(pk=product.pk)
+    product.category = other
+    with django_capture_on_commit_callbacks(execute=True):
+        product.save()
+
+    assert [row['id'] for row in client.get(url).data['products']['results']] == [product.pk]
+    assert client.get(reverse('category-detail', args=[category.slug])).data['products']['results'] == []
+
+
+@pytest.mark.django_db
+def test_product_joining_a_filtered_page_shows_up(product, django_capture_on_commit_callbacks):
+    client = APIClient()
+    url = reverse('products-list')
+    assert client.get(url, {'price__lte': 1000}).data['results'] == []
+
+    product = Product.objects.get(pk=product.pk)
+    product.price = 900
+    with django_capture_on_commit_callbacks(execute=True):
+        product.save()
+
+    assert [row['id'] for row in client.get(url, {'price__lte': 1000}).data['results']] == [product.pk]
+
+
+@pytest.mark.django_db
+def test_product_detail_conditional_get(product, django_capture_on_commit_callbacks):
+    client = APIClient()
+    url = reverse('product-detail', args=[product.category.slug, product.slug])
+
+    etag = client.get(url)['ETag']
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+    product = Product.objects.get(pk=product.pk)
+    product.stock = 3
+    with django_capture_on_commit_callbacks(execute=True):
+        product.save()
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response.data['stock'] == 3
+    assert response['ETag'] != etag
+
+
+@pytest.mark.django_db
+class TestPagination:
+    @pytest.fixture
+    def products(self, product, make_product):
+        others = [make_product(name=f'Duck {i}', slug=f'duck-{i}') for i in range(4)]
+        # the same date everywhere, only the id tiebreak orders them
+        Product.objects.update(date_added=product.date_added)
+        return sorted([product, *others], key=lambda product: product.pk, reverse=True)
+
+    def test_cursor_pages_follow_the_id_tiebreak(self, products):
+        client = APIClient()
+        response = client.get(reverse('products-list'), {'pagination': 'cursor', 'page_size': 2})
+        seen = []
+        while True:
+            assert response.status_code == 200
+            assert 'count' not in response.data
+            seen += [row['id'] for row in response.data['results']]
+            if response.data['next'] is None:
+                break
+            assert 'cursor=' in response.data['next']
+            response = client.get(response.data['next'])
+
+        assert seen == [product.pk for product in products]
+
+    def test_page_numbers_by_default(self, products):
+        response = APIClient().get(reverse('products-list'), {'page_size': 2, 'page': 3})
+        assert response.status_code == 200
+        assert response.data['count'] == len(products)
+        assert [row['id'] for row in response.data['results']] == [products[-1].pk]
+
+    def test_no_cursor_while_searching(self, products):
+        response = APIClient().get(reverse('products-list'), {'pagination': 'cursor', 'search': 'duck'})
+        assert response.status_code == 400
+        assert 'pagination' in response.data
+
+
+@pytest.mark.django_db
+class TestEffectivePrice:
+    @pytest.fixture
+    def discount(self, db):
+        return Discount.objects.create(name='sale', percent=10)
+
+    @pytest.fixture
+    def discounted(self, make_product, discount):
+        return make_product(name='Sale duck', slug='sale-duck', price=1255, discount=discount)
+
+    def test_saved_with_the_discount(self, discounted):
+        assert Product.objects.get(pk=discounted.pk).effective_price == discounted.discounted_price == 1129
+
+    def test_follows_discount_changes(self, discounted, discount):
+        discount.percent = 20
+        discount.save()
+        assert Product.objects.get(pk=discounted.pk).effective_price == 1004
+
+        discount.active = False
+        discount.save()
+        assert Product.objects.get(pk=discounted.pk).effective_price == 1255
+
+    def test_reset_when_discount_is_deleted(self, discounted, discount):
+        discount.delete()
+        assert Product.objects.get(pk=discounted.pk).effective_price == 1255
+
+    def test_category_index_ranges_the_prices_paid(self, discounted, make_product):
+        make_product(name='Big duck', slug='big-duck', price=2000)
+
+        response = APIClient().get(reverse('category-list'))
+        row, = response.data
+        assert (row['min_price'], row['max_price']) == (1129, 2000)
+
+    def test_discount_below_minimum_price_is_invalid(self, discounted, discount):
+        discount.percent = 97
+        with pytest.raises(ValidationError):
+            discount.full_clean()
+
+    def test_sweeper_follows_the_schedule(self, discounted, discount):
+        now = timezone.now()
+        discount.active = False
+        discount.starts_at = now - timedelta(hours=1)
+        discount.ends_at = now + timedelta(hours=1)
+        discount.save()
+        assert Product.objects.get(pk=discounted.pk).effective_price == 1255
+
+        assert sweep_discounts(now) == ([discount.pk], [], [])
+        assert Product.objects.get(pk=discounted.pk).effective_price == 1129
+
+        assert sweep_discounts(now + timedelta(hours=2)) == ([], [discount.pk], [])
+        assert Product.objects.get(pk=discounted.pk).effective_price == 1255
+
+
+@pytest.mark.django_db
+class TestSearch:
+    @pytest.fixture
+    def ranked(self, make_product):
+        kettles = Category.objects.create(name="Kettle gear", slug="kettle-gear")
+        return [
+            make_product(name='Kettle duck', slug='kettle-duck'),
+            make_product(category=kettles, name='Whistle', slug='whistle'),
+            make_product(name='Steam duck', slug='steam-duck', description='Sits on a kettle'),
+        ]
+
+    def search(self, terms):
+        response = APIClient().get(reverse('products-list'), {'search': terms})
+        assert response.status_code == 200
+        return [row['id'] for row in response.data['results']]
+
+    def test_name_ranks_above_category_above_description(self, ranked, product):
+        assert self.search('kettle') == [match.pk for match in ranked]
+
+    def test_renames_are_searchable(self, product, category):
+        product = Product.objects.get(pk=product.pk)
+        product.name = 'Teapot'
+        product.save()
+        category = Category.objects.get(pk=category.pk)
+        category.name = 'Kitchen'
+        category.save()
+
+        assert self.search('teapot') == [product.pk]
+        assert self.search('kitchen') == [product.pk]
+        assert self.search('duck') == []
+
+    def test_vectors_are_only_updated_when_a_searched_field_changes(self, product, category, monkeypatch):
+        updates = []
+        update_search_vector = ProductQuerySet.update_search_vector
+
+        def record(queryset):
+            updates.append(list(queryset.values_list('pk', flat=True)))
+            return update_search_vector(queryset)
+
+        monkeypatch.setattr(ProductQuerySet, 'update_search_vector', record)
+        product = Product.objects.get(pk=product.pk)
+        product.stock = 3
+        product.save()
+        category = Category.objects.get(pk=category.pk)
+        category.icon = 'icons/duck.png'
+        category.save()
+        assert updates == []
+
+        product.description = 'Squeaks'
+        product.save()
+        category.name = 'Bath ducks'
+        category.save()
+        assert updates == [[product.pk], [product.pk]]
+
+
+@pytest.mark.django_db
+class TestFacets:
+    @pytest.fixture
+    def catalog(self, product, make_product):
+        toys = Category.objects.create(name="Bath toys", slug="bath-toys")
+        gold = make_product(name='Gold duck', slug='gold-duck', price=30000, stock=0)
+        boat = make_product(category=toys, name='Boat', slug='boat', price=500)
+        ProductStats.apply_rating(product.pk, 1, 5)
+        ProductStats.apply_rating(boat.pk, 2, 5)
+        return {'toys': toys, 'gold': gold, 'boat': boat}
+
+    def facets(self, **params):
+        response = APIClient().get(reverse('products-list'), {'facets': 1, **params})
+        assert response.status_code == 200
+        return response.data['facets']
+
+    def test_counts_follow_the_filters(self, catalog, category):
+        facets = self.facets(stock__gte=1)
+
+        assert facets['count'] == 2
+        assert [(row['slug'], row['count']) for row in facets['categories']] == [('bath-toys', 1), (category.slug, 1)]
+        assert [row['count'] for row in facets['price']] == [1, 1, 0, 0, 0, 0, 0]
+        assert facets['stock'] == {'in_stock': 2, 'out_of_stock': 0}
+        assert [(row['min'], row['count']) for row in facets['rating']] == [(4, 1), (3, 1), (2, 2), (1, 2)]
+
+    def test_category_filter(self, catalog, category):
+        facets = self.facets(category=category.pk)
+
+        assert facets['count'] == 2
+        assert [row['slug'] for row in facets['categories']] == [category.slug]
+        assert [row['count'] for row in facets['price']] == [0, 1, 0, 0, 0, 1, 0]
+        assert facets['stock'] == {'in_stock': 1, 'out_of_stock': 1}
+
+    def test_facets_are_left_out_unless_asked_for(self, catalog):
+        response = APIClient().get(reverse('products-list'))
+        assert 'facets' not in response.data
+
+
+@pytest.mark.django_db
+class TestBatch:
+    @pytest.fixture
+    def others(self, make_product):
+        return [make_product(name=f'Duck {i}', slug=f'duck-{i}') for i in range(2)]
+
+    def batch(self, **params):
+        return APIClient().get(reverse('products-batch'), params)
+
+    def test_requested_order_ids_first(self, product, others, category):
+        first, second = others
+        response = self.batch(
+            ids=f'{second.pk},404,{first.pk}', slugs=f'{category.slug}/{product.slug},{category.slug}/nope'
+        )
+
+        assert response.status_code == 200
+        assert [row['id'] for row in response.data['results']] == [second.pk, first.pk, product.pk]
+        assert response.data['missing'] == {'ids': [404], 'slugs': [f'{category.slug}/nope']}
+
+    def test_up_to_100_products(self, product):
+        assert self.batch(ids=','.join([str(product.pk)] * 100)).status_code == 200
+
+        response = self.batch(ids=','.join([str(product.pk)] * 100), slugs='rubber-ducks/yellow-duck')
+        assert response.status_code == 400
+
+    def test_ids_or_slugs_are_required(self):
+        assert self.batch().status_code == 400
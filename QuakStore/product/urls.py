@@ -9,6 +9,7 @@ router.register('products', views.LatestProductsList, basename='products')
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('autocomplete/', views.Autocomplete.as_view(), name='autocomplete'),
     path('products/<slug:category_slug>/<slug:product_slug>/',
          views.ProductDetails.as_view(), name='product-detail'),
     path('products/<slug:category_slug>/',
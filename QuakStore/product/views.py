@@ -1,14 +1,14 @@
 from django.shortcuts import render
+from django.utils.cache import patch_cache_control
 from django.http import Http404
-from django.db.models import Subquery, OuterRef, Exists, Avg, QuerySet, Count, DecimalField, Prefetch
-from django.db.models.functions import Cast
+from django.db.models import Count, Q, Min, Max, F
 
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework import generics
 from rest_framework import viewsets
 from rest_framework import mixins
-from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.pagination import CursorPagination
 from rest_framework import filters
 from rest_framework.exceptions import ValidationError
 from rest_framework.decorators import action
@@ -17,75 +17,154 @@ from rest_framework.request import Request
 
 import django_filters
 
-from .serializers import ProductSerializer, CategorySerializer, serializers
+from .serializers import ProductSerializer, CategorySerializer, CategoryIndexSerializer, ProductBatchSerializer, serializers
 from .models import Product, Category, ProductImage
-
-from reviews.models import Review
+from .filters import RankedSearchFilter, ProductFilter
+from .facets import product_facets
+from .autocomplete import suggest
+from .slugs import product_id_or_404, category_id_or_404
+from .cache import product_tags, category_tags, list_tags, PRODUCTS_LIST_TAG, CATEGORIES_LIST_TAG, CATEGORY_INDEX_TAG, FACETS_TAG
 
 from favorites.models import Favorite
+from favorites.services import overlay_favorites
 
 from drf_yasg.utils import swagger_auto_schema
+from drf_yasg import openapi
+
+from common.pagination import PageOrCursorPagination
+from common.cache import get_or_build, etag_for
+from common.conditional import conditional_response
+from common.streaming import StreamingExportMixin
+from common.serializers import sparse_fieldset
+
+def user_etag(etag: str, user, favorited: set[int]) -> str:
+    """
+    The ETag of a shared catalog response once the user's favorites overlay
+    is applied on it.
+    """
+    if not user.is_authenticated:
+        return etag
+    return etag_for(etag, user.pk, sorted(favorited))
 
-class ProductPagination(PageNumberPagination):
+
+class ProductPagination(PageOrCursorPagination):
     page_size=10
     page_size_query_param = 'page_size'
     max_page_size= 100
-    ordering= '-date_added'
+    ordering= ('-date_added', '-id')
 
 
-class LatestProductsList(viewsets.GenericViewSet, mixins.ListModelMixin):
+class ProductListMixin:
+    """
+    Queryset, filters, ordering and pagination shared by the product
+    listings.
+    """
     pagination_class = ProductPagination
     serializer_class = ProductSerializer
     filter_backends = [
-        django_filters.rest_framework.DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter
+        django_filters.rest_framework.DjangoFilterBackend, RankedSearchFilter, filters.OrderingFilter
     ]
-    filterset_fields = ['category', 'stock']
-    search_fields = ['@name', '@description', '@category__name']
-    ordering_fields = ['rating_count', 'order_count', 'date_added', 'date_modified', 'price', 'stock']
+    filterset_class = ProductFilter
+    ordering_fields = ['rating_count', 'order_count', 'units_sold', 'date_added', 'date_modified', 'price', 'effective_price', 'stock']
 
     cache_timeout = 60 * 15
+    # milliseconds, see common.budget
+    statement_timeout = 3000
     
+    def get_ordering_terms(self) -> list[str]:
+        param = self.request.query_params.get(filters.OrderingFilter.ordering_param, '')
+        return [term.strip() for term in param.split(',') if term.strip()]
+
     def get_queryset(self):
-        queryset = Product.objects \
-        .select_related('discount', 'category') \
-        .prefetch_related('images')
-        
-        queryset= queryset.annotate(
-            avg_rating=Cast(Avg('reviews__rating'),DecimalField(max_digits=5, decimal_places=2)),\
-            rating_count= Count('reviews'),\
-            order_count= Count('orders')
-            ).cache()
+        included, excluded = sparse_fieldset(self.request)
+        queryset = Product.objects.for_fields(included, excluded, self.get_ordering_terms())
                 
-        return queryset.order_by('-date_added').all()
-    
-    def get_serializer(self, queryset: QuerySet=None, *args, **kwargs):
-        
-        if queryset is None:
-            return super().get_serializer(queryset, *args, **kwargs)
-        
-        if not hasattr(queryset, '__iter__'):
-            return super().get_serializer(queryset, *args, **kwargs)
-        
-        products = []
-        favorites = []
-        if self.request.user.is_authenticated:
-            favorites = Favorite.objects.filter(user= self.request.user).all()
-            
-        products_favorites = [favorite.product_id for favorite in favorites]
-        for product in queryset:
-            products.append(product)
-            if product.pk in products_favorites:
-                product.is_favorited = True
-        
-        return super().get_serializer(products, *args, **kwargs)
+        return queryset.order_by('-date_added', '-id').all()
     
-    
-    def list(self, request, *args, **kwargs):   
-        try: 
-            response = super().list(request, *args, **kwargs)
-        except Exception as e:
-            print(e)
-        return response
+    def paginate_queryset(self, queryset):
+        self.page_objects = super().paginate_queryset(queryset)
+        return self.page_objects
+
+
+class LatestProductsList(ProductListMixin, StreamingExportMixin, viewsets.GenericViewSet, mixins.ListModelMixin):
+    facets_param = 'facets'
+    query_budget = {'list': 8, 'batch': 8, 'export': 6, 'toggle_favorite': 8}
+
+    def get_facets(self, request) -> tuple[dict, str]:
+        """
+        The facets of the filtered listing and their ETag, cached per
+        filter and search parameters whatever the page and ordering.
+        """
+        def build():
+            # filtered like the listing, ordering left out
+            queryset = Product.objects.all()
+            for backend in (django_filters.rest_framework.DjangoFilterBackend, RankedSearchFilter):
+                queryset = backend().filter_queryset(request, queryset, self)
+            facets = product_facets(queryset)
+            tags = {FACETS_TAG, CATEGORIES_LIST_TAG} | {f"category:{category['id']}" for category in facets['categories']}
+            return facets, tags
+
+        params = [*ProductFilter.base_filters, RankedSearchFilter.search_param]
+        return get_or_build(request, build, self.cache_timeout, prefix='facets', params=params)
+
+    @swagger_auto_schema(manual_parameters=[
+        openapi.Parameter('facets', openapi.IN_QUERY, "Add the product counts per category, price, stock and rating", type=openapi.TYPE_BOOLEAN)
+    ])
+    def list(self, request, *args, **kwargs):
+        def build():
+            response = super(LatestProductsList, self).list(request, *args, **kwargs)
+            return response.data, product_tags(self.page_objects) | list_tags(self.get_ordering_terms())
+
+        data, etag = get_or_build(request, build, self.cache_timeout)
+        if request.query_params.get(self.facets_param, '').lower() in ('1', 'true'):
+            data['facets'], facets_etag = self.get_facets(request)
+            etag = etag_for(etag, facets_etag)
+        favorited = overlay_favorites(data['results'], request.user)
+        etag = user_etag(etag, request.user, favorited)
+        return conditional_response(request, lambda: Response(data), etag=etag)
+
+    @swagger_auto_schema(method='get', query_serializer=ProductBatchSerializer)
+    @action(['get'], detail=False, pagination_class=None)
+    def batch(self, request):
+        """
+        Up to 100 products by id and/or `category-slug/product-slug`, in one
+        query and in the requested order, ids first, along with the ones
+        not found.
+        """
+        params = ProductBatchSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        ids = params.validated_data.get('ids', [])
+        slugs = params.validated_data.get('slugs', [])
+
+        def build():
+            lookup = Q(pk__in=ids)
+            for category_slug, product_slug in slugs:
+                lookup |= Q(category__slug=category_slug, slug=product_slug)
+            products = self.get_queryset()\
+                .filter(lookup)\
+                .annotate(category_slug=F('category__slug'), product_slug=F('slug'))\
+                .order_by()
+
+            by_id = {}
+            by_slugs = {}
+            for product in products:
+                by_id[product.pk] = product
+                by_slugs[(product.category_slug, product.product_slug)] = product
+
+            found = [by_id[pk] for pk in ids if pk in by_id] + [by_slugs[pair] for pair in slugs if pair in by_slugs]
+            data = {
+                'results': self.get_serializer(found, many=True).data,
+                'missing': {
+                    'ids': [pk for pk in ids if pk not in by_id],
+                    'slugs': ['/'.join(pair) for pair in slugs if pair not in by_slugs],
+                },
+            }
+            return data, product_tags(by_id.values()) | {PRODUCTS_LIST_TAG}
+
+        data, etag = get_or_build(request, build, self.cache_timeout)
+        favorited = overlay_favorites(data['results'], request.user)
+        etag = user_etag(etag, request.user, favorited)
+        return conditional_response(request, lambda: Response(data), etag=etag)
 
     @swagger_auto_schema(
         method='post',
@@ -110,49 +189,105 @@ class LatestProductsList(viewsets.GenericViewSet, mixins.ListModelMixin):
         return Response(status=status.HTTP_201_CREATED)
         
 class ProductDetails(APIView):
+    cache_timeout = 60 * 15
+    query_budget = 6
+
     def get_object(self, category_slug, product_slug):
+        product_id = product_id_or_404(category_slug, product_slug)
         try:
-            return Product.objects.filter(category__slug=category_slug, slug=product_slug).select_related('discount').prefetch_related('images')\
-            .annotate(avg_rating=Cast(Avg('reviews__rating'), DecimalField(max_digits=5, decimal_places=2)), rating_count= Count('reviews'), is_favorited=Exists(Favorite.objects.filter(product_id=OuterRef('id'), user_id = self.request.user.id if self.request.user.is_authenticated else None)))\
+            return Product.objects.filter(pk=product_id).select_related('discount', 'category').prefetch_related('images')\
+            .with_rating()\
             .get()
         except Product.DoesNotExist:
             raise Http404()
 
     def get(self, request, category_slug, product_slug, format=None):
-        product = self.get_object(category_slug, product_slug)
-        product = ProductSerializer(
-            product, context={'request': request}, detail=True)
-        return Response(product.data)
+        def build():
+            product = self.get_object(category_slug, product_slug)
+            data = ProductSerializer(
+                product, context={'request': request}, detail=True).data
+            return data, product_tags([product])
+
+        data, etag = get_or_build(request, build, self.cache_timeout)
+        favorited = overlay_favorites([data], request.user)
+        etag = user_etag(etag, request.user, favorited)
+        return conditional_response(request, lambda: Response(data), etag=etag)
 
 
-class CategoryDetail(APIView):
-    def get_object(self, category_slug):
+class CategoryDetail(ProductListMixin, generics.GenericAPIView):
+    """
+    The category with one page of its products, filtered, ordered and
+    paginated like the product listing.
+    """
+    query_budget = 10
+
+    def get_category(self, category_slug):
         try:
-            return Category.objects\
-            .prefetch_related(Prefetch(
-                'products',
-                Product.objects
-                .select_related('discount')
-                .prefetch_related('images')
-                .annotate(
-                    avg_rating=Cast(Avg('reviews__rating'),
-                    DecimalField(max_digits=5, decimal_places=2)),
-                    rating_count= Count('reviews')
-                )
-            ))\
-            .get(slug=category_slug)
+            return Category.objects.get(pk=category_id_or_404(category_slug))
         except Category.DoesNotExist:
             raise Http404()
 
+    def get_queryset(self):
+        return super().get_queryset().filter(category=self.category)
+
     def get(self, request, category_slug, format=None):
-        Category = self.get_object(category_slug)
-        Category = CategorySerializer(Category, context={'request': request})
-        return Response(Category.data)
+        def build():
+            self.category = self.get_category(category_slug)
+            page = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+            products = self.get_serializer(page, many=True).data
+
+            data = CategorySerializer(self.category, context={'request': request}, detail=False).data
+            data['products'] = self.get_paginated_response(products).data
+            tags = product_tags(page) | category_tags([self.category]) | list_tags(self.get_ordering_terms())
+            return data, tags
+
+        data, etag = get_or_build(request, build, self.cache_timeout)
+        favorited = overlay_favorites(data['products']['results'], request.user)
+        etag = user_etag(etag, request.user, favorited)
+        return conditional_response(request, lambda: Response(data), etag=etag)
 
 
 class CategoryList(generics.ListAPIView):
-    serializer_class = CategorySerializer
-    queryset = Category.objects.all().prefetch_related('products')
-    
-    def get_serializer(self, *args, **kwargs):
-        return super().get_serializer(detail=False ,*args, **kwargs)
+    """
+    Category index with product counts and the range of the prices paid,
+    aggregated in one query and cached until a product changes.
+    """
+    serializer_class = CategoryIndexSerializer
+    queryset = Category.objects.annotate(
+        product_count=Count('products'),
+        in_stock_count=Count('products', filter=Q(products__stock__gt=0)),
+        min_price=Min('products__effective_price'),
+        max_price=Max('products__effective_price'),
+    )
+
+    cache_timeout = 60 * 15
+    query_budget = 3
+
+    def list(self, request, *args, **kwargs):
+        def build():
+            categories = self.get_queryset()
+            data = self.get_serializer(categories, many=True).data
+            return data, category_tags(categories) | {CATEGORIES_LIST_TAG, CATEGORY_INDEX_TAG}
+
+        data, etag = get_or_build(request, build, self.cache_timeout)
+        return conditional_response(request, lambda: Response(data), etag=etag)
+
+
+class Autocomplete(APIView):
+    """
+    Typeahead suggestions over the product and category names, with only
+    what a dropdown shows.
+    """
+    # same answer for everyone, skips the token lookup
+    authentication_classes = []
+    query_budget = 3
+    term_param = 'q'
+    max_age = 60
+
+    @swagger_auto_schema(manual_parameters=[
+        openapi.Parameter('q', openapi.IN_QUERY, "At least 3 characters of a product or category name", type=openapi.TYPE_STRING)
+    ])
+    def get(self, request, format=None):
+        response = Response(suggest(request.query_params.get(self.term_param, '')))
+        patch_cache_control(response, public=True, max_age=self.max_age)
+        return response
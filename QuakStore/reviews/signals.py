@@ -0,0 +1,44 @@
+from django.dispatch import receiver
+from django.db.models.signals import post_save, post_delete
+
+from common.cache import invalidate_tags
+from product.models import ProductStats
+from product.cache import FACETS_TAG, PRODUCTS_LIST_TAG
+
+from .models import Review
+
+
+@receiver(post_save, sender=Review)
+def update_product_rating(sender, instance: Review, created: bool, *args, **kwargs):
+    loaded_rating = getattr(instance, '_loaded_rating', None)
+    if created:
+        updated = ProductStats.apply_rating(instance.product_id, 1, instance.rating)
+    elif loaded_rating is None:
+        updated = 0
+    else:
+        updated = ProductStats.apply_rating(instance.product_id, 0, instance.rating - loaded_rating)
+
+    if not updated:
+        ProductStats.rebuild([instance.product_id])
+    instance._loaded_rating = instance.rating
+
+
+@receiver(post_delete, sender=Review)
+def remove_product_rating(sender, instance: Review, *args, **kwargs):
+    # no rebuild fallback here, the product itself may be in the middle of a cascade delete
+    ProductStats.apply_rating(instance.product_id, -1, -instance.rating)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_review_cache(sender, instance: Review, created: bool = False, *args, **kwargs):
+    tags = [
+        f"review:{instance.pk}",
+        f"reviews:product:{instance.product_id}",
+        f"product:{instance.product_id}",
+        FACETS_TAG,
+    ]
+    if created or kwargs.get('signal') is post_delete:
+        # the listings ordered by rating count
+        tags.append(PRODUCTS_LIST_TAG)
+    invalidate_tags(*tags)
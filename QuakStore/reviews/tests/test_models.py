@@ -5,6 +5,8 @@ from django.core.exceptions import ValidationError
 
 from product.models import Product, Category
 
+from decimal import Decimal
+
 
 User = get_user_model()
 
@@ -76,6 +78,49 @@ def test_related_names():
     
     product.reviews
     user.reviews
-         
+
+@pytest.mark.django_db
+def test_product_stats_follow_reviews():
+    from ..models import Review
+    
+    product, user = create_user_product()
+    other_user = User.objects.create(username="user2", password="123")
+    
+    review = Review.objects.create(user=user, product=product, rating=4, comment="Good product")
+    Review.objects.create(user=other_user, product=product, rating=1, comment="Bad product")
+    
+    product.stats.refresh_from_db()
+    assert product.stats.rating_count == 2
+    assert product.stats.rating_sum == 5
+    assert product.stats.avg_rating == Decimal('2.50')
     
+    review = Review.objects.get(pk=review.pk)
+    review.rating = 5
+    review.save()
+    
+    product.stats.refresh_from_db()
+    assert product.stats.rating_count == 2
+    assert product.stats.rating_sum == 6
+    assert product.stats.avg_rating == Decimal('3.00')
+    
+    review.delete()
+    
+    product.stats.refresh_from_db()
+    assert product.stats.rating_count == 1
+    assert product.stats.avg_rating == Decimal('1.00')
 
+@pytest.mark.django_db
+def test_product_stats_rebuild():
+    from ..models import Review
+    from product.models import ProductStats
+    
+    product, user = create_user_product()
+    Review.objects.create(user=user, product=product, rating=3, comment="Okay")
+    ProductStats.objects.all().delete()
+    
+    ProductStats.rebuild()
+    
+    stats = ProductStats.objects.get(product=product)
+    assert stats.rating_count == 1
+    assert stats.rating_sum == 3
+    assert stats.avg_rating == Decimal('3.00')
@@ -57,7 +57,7 @@ class TestReviewSerializer:
         data = serializer.data
         assert data['rating'] == valid_data['rating']
         assert data['product']== product.pk
-        assert data['user'] == {'avatar': None, 'username': user.username}
+        assert data['user'] == {'avatar': None, 'avatar_srcset': None, 'username': user.username}
         
     def test_valid_deserialization(self, valid_data):
         from ..serializers import ReviewSerializer, ReviewCreateSerializer
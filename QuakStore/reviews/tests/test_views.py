@@ -4,6 +4,7 @@ import pytest
 
 from django.contrib.auth import get_user_model
 from django.urls import reverse
+from django.core.cache import cache
 
 from ..models import Review
 
@@ -11,6 +12,15 @@ from product.models import Category, Product
 
 User = get_user_model()
 
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # slug resolutions and cached pages would outlive the rolled back rows
+    cache.clear()
+    yield
+    cache.clear()
+
+
 @pytest.mark.django_db
 class TestViews:
     @pytest.fixture
@@ -57,6 +67,12 @@ class TestViews:
         assert response.status_code == 400
         assert 'rating' in response.data
     
+    def test_unknown_product_slug_is_not_found(self, product):
+        client = APIClient()
+        url = reverse('reviews-list', args=[product.category.slug, 'unknown'])
+        assert client.get(url).status_code == 404
+        assert client.get(url).status_code == 404
+    
     def test_put_review_as_owner(self, setup_data, product, user):
         client = APIClient()
         client.force_authenticate(user)
@@ -93,4 +109,31 @@ class TestViews:
         response = client.get(url, {'page': 1, 'page_size': 5}, )
         assert response.status_code == 200
         assert 'next' in response.data
-        assert len(response.data['results']) <= 5
\ No newline at end of file
+        assert len(response.data['results']) <= 5
+
+    def test_list_conditional_get(self, setup_data, product, other_user, django_capture_on_commit_callbacks):
+        client = APIClient()
+        url = reverse('reviews-list', args=[product.category.slug, product.slug])
+
+        etag = client.get(url)['ETag']
+        assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+        with django_capture_on_commit_callbacks(execute=True):
+            Review.objects.create(rating=2, product=product, user=other_user, comment="meh")
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response.data['count'] == 2
+        assert response['ETag'] != etag
+
+    def test_authenticated_list_follows_the_reviewers(self, setup_data, product, user, other_user, django_capture_on_commit_callbacks):
+        client = APIClient()
+        client.force_authenticate(other_user)
+        url = reverse('reviews-list', args=[product.category.slug, product.slug])
+
+        etag = client.get(url)['ETag']
+        assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+        user.first_name = 'Renamed'
+        with django_capture_on_commit_callbacks(execute=True):
+            user.save()
+        assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
@@ -1,6 +1,6 @@
 from django.shortcuts import render
-from django.shortcuts import get_object_or_404
 from django.db.models import Case, Value, When, BooleanField
+from django.db import transaction
 
 from rest_framework import viewsets
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
@@ -10,26 +10,27 @@ from rest_framework.request import Request
 
 from .serializers import ReviewSerializer, ReviewCreateSerializer, ReviewUpdateSerializer, Review
 from .permissions import OwnerOrReadOnly
-from .models import Product, Category
 
 from orders.views import OrderPagination
+from common.cache import get_or_build, etag_for, tag_versions, request_cache_key
+from common.conditional import conditional_response
+from product.slugs import product_id_or_404
 class ReviewViewSet(viewsets.ModelViewSet):
     serializer_class= ReviewSerializer
     permission_classes= [OwnerOrReadOnly]
     pagination_class= OrderPagination
+
+    cache_timeout = 60 * 15
+    query_budget = {'list': 8, 'retrieve': 6}
     
     def get_queryset(self):
-        category_slug = self.kwargs.get('category_slug')
-        product_slug = self.kwargs.get('product_slug')
-        
-        category = get_object_or_404(Category, slug=category_slug)
-        product = get_object_or_404(Product, slug=product_slug, category=category)
+        self.product_id = product_id_or_404(self.kwargs.get('category_slug'), self.kwargs.get('product_slug'))
         
         user = self.request.user if self.request.user.is_authenticated else None
         
         return Review.objects\
             .select_related('user', 'user__payment_details', 'product', 'product__category') \
-            .filter(product= product) \
+            .filter(product_id=self.product_id) \
             .annotate(
                 is_user_review= Case(
                     When(
@@ -41,6 +42,35 @@ class ReviewViewSet(viewsets.ModelViewSet):
                 )
             ).order_by('-is_user_review', '-date_added')
     
+    def paginate_queryset(self, queryset):
+        self.page_objects = super().paginate_queryset(queryset)
+        return self.page_objects
+
+    def list(self, request, *args, **kwargs):
+        # the ordering puts the user's own review first, only anonymous pages are shared
+        if request.user.is_authenticated:
+            self.get_queryset()
+            # the reviewers' names and avatars are in the body too
+            reviewers = Review.objects.filter(product_id=self.product_id).values_list('user_id', flat=True)
+            versions = tag_versions([
+                f"reviews:product:{self.product_id}", *(f"user:{user_id}" for user_id in set(reviewers))
+            ])
+            etag = etag_for(request_cache_key(request, 'reviews'), request.user.pk, sorted(versions.items()))
+            return conditional_response(
+                request, lambda: super(ReviewViewSet, self).list(request, *args, **kwargs), etag=etag
+            )
+
+        def build():
+            response = super(ReviewViewSet, self).list(request, *args, **kwargs)
+            tags = {f"reviews:product:{self.product_id}"}
+            for review in self.page_objects:
+                tags.add(f"review:{review.pk}")
+                tags.add(f"user:{review.user_id}")
+            return response.data, tags
+
+        data, etag = get_or_build(request, build, self.cache_timeout, prefix='reviews')
+        return conditional_response(request, lambda: Response(data), etag=etag)
+
     def get_serializer_class(self):
         if self.request.method in ('POST',):
             return ReviewCreateSerializer
@@ -51,15 +81,23 @@ class ReviewViewSet(viewsets.ModelViewSet):
     def create(self, request: Request, *args, **kwargs):
         data = request.data.copy()
         
-        product_slug = self.kwargs.get('product_slug')
-        category_slug= self.kwargs.get('category_slug')
-        product = get_object_or_404(Product, slug=product_slug, category__slug=category_slug)
-
         data['user'] = request.user.pk
-        data['product'] = product.pk
+        data['product'] = product_id_or_404(self.kwargs.get('category_slug'), self.kwargs.get('product_slug'))
         
         serializer = self.get_serializer(data=data)
         serializer.is_valid(raise_exception=True)
         self.perform_create(serializer)
         headers = self.get_success_headers(serializer.data)
-        return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
\ No newline at end of file
+        return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
+    
+    @transaction.atomic
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
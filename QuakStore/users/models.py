@@ -14,6 +14,7 @@ class User(AbstractUser):
     )
     email= models.EmailField(_("email address"))
     avatar= models.ImageField(_("Profile Avatar"), upload_to='uploads/avatars/', null=True, blank=True) 
+    renditions= models.JSONField(default=dict, blank=True, editable=False)
     
     def clear_cart(self):
         self.items.clear()
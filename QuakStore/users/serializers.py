@@ -1,6 +1,8 @@
 from djoser.serializers import UserCreateSerializer as DjoserCreateSerializer, UserSerializer as DjoserUserSerializer, TokenSerializer as DjoserTokenSerializer
+from rest_framework import serializers
 from rest_framework.fields import empty
 from payment.serializers import PaymentDetailsSerializer
+from common.renditions import srcset
 
 class UserCreateSerializer(DjoserCreateSerializer):
     class Meta(DjoserCreateSerializer.Meta):
@@ -12,11 +14,15 @@ class UserSerializer(DjoserUserSerializer):
         fields = DjoserUserSerializer.Meta.fields + ('email', 'avatar', 'payment_details')
         
 class PublicUserSerializer(DjoserUserSerializer):
+    avatar_srcset = serializers.SerializerMethodField()
     def __init__(self, instance=None, data=..., **kwargs):
         super().__init__(instance, data, **kwargs)
         self.fields.pop('email')
     class Meta(DjoserUserSerializer.Meta):
-        fields = DjoserUserSerializer.Meta.fields + ('avatar',)
+        fields = DjoserUserSerializer.Meta.fields + ('avatar', 'avatar_srcset')
+
+    def get_avatar_srcset(self, obj):
+        return srcset(obj.renditions, self.context.get('request'))
 
 class TokenSerializer(DjoserTokenSerializer):
     user = UserSerializer(read_only=True)
@@ -0,0 +1,29 @@
+from django.dispatch import receiver
+from django.db import transaction
+from django.db.models.signals import post_save
+
+from common.cache import invalidate_tags
+from common.renditions import submit, build_renditions, needs_renditions
+
+from .models import User
+
+
+def build_avatar_renditions(user_id: int) -> dict:
+    renditions = build_renditions(User, user_id, 'avatar')
+    invalidate_tags(f"user:{user_id}")
+    return renditions
+
+
+@receiver(post_save, sender=User)
+def schedule_avatar_renditions(sender, instance: User, *args, **kwargs):
+    if not needs_renditions(instance, 'avatar'):
+        return
+    pk = instance.pk
+    transaction.on_commit(lambda: submit(build_avatar_renditions, pk))
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_cache(sender, instance: User, created: bool, *args, **kwargs):
+    if created:
+        return
+    invalidate_tags(f"user:{instance.pk}")